@@ -1,10 +1,12 @@
+import json
 import os
 
-from flask import Flask, jsonify
+from flask import Flask, Response, make_response, request
 from flask_cors import CORS
 from config import config
 from routes.inventory_routes import home_bp
 from routes.checkout_routes import checkout_bp
+from json_provider import OrjsonProvider
 import database
 
 '''
@@ -12,6 +14,44 @@ main flask application
 factory pattern with blueprints
 '''
 
+CORS_ORIGINS = ["http://localhost:3001", "http://localhost:3000"]
+CORS_HEADERS = ["Content-Type", "Authorization"]
+CORS_METHODS = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
+
+# Preflight response headers, built once at import
+_CORS_PREFLIGHT_HEADERS = {
+    'Access-Control-Allow-Methods': ', '.join(CORS_METHODS),
+    'Access-Control-Allow-Headers': ', '.join(CORS_HEADERS),
+    'Access-Control-Allow-Credentials': 'true',
+    'Vary': 'Origin'
+}
+
+API_INFO = {
+    'name': 'Inventory Management API',
+    'version': '1.0.0',
+    'description': 'RESTful API for equipment inventory checkout system',
+    'endpoints': {
+        'inventory': {
+            'get_inventory': 'GET /api/inventory?location={location}&ldap={ldap}',
+            'search': 'GET /api/inventory/search?q={query}&location={location}',
+            'get_item': 'GET /api/inventory/{item_id}'
+        },
+        'checkout': {
+            'checkout': 'POST /api/checkout',
+            'bulk_checkout': 'POST /api/checkout/bulk',
+            'checkin': 'POST /api/checkout/checkin',
+            'active': 'GET /api/checkout/active',
+            'overdue': 'GET /api/checkout/overdue',
+            'user_history': 'GET /api/checkout/user/{ldap}',
+            'item_history': 'GET /api/checkout/item/{item_id}/history'
+        }
+    }
+}
+
+# Static response bodies, encoded once at import
+_ROOT_BODY = json.dumps(API_INFO).encode()
+_HEALTH_BODY = json.dumps({'status': 'healthy', 'database': 'connected'}).encode()
+
 
 def create_app(config_name=None):
     '''
@@ -33,14 +73,32 @@ def create_app(config_name=None):
 
     app.config.from_object(config[config_name])
 
+    # Serialize responses (including datetimes) with orjson
+    app.json = OrjsonProvider(app)
+
     # Configure CORS to allow frontend access
     # Allow all origins in development (for troubleshooting)
     CORS(app,
-         origins=["http://localhost:3001", "http://localhost:3000"],
+         origins=CORS_ORIGINS,
          supports_credentials=True,
-         allow_headers=["Content-Type", "Authorization"],
-         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
-
+         allow_headers=CORS_HEADERS,
+         methods=CORS_METHODS)
+
+    @app.before_request
+    def cors_preflight():
+        """Answer CORS preflights for known routes directly, skipping route dispatch"""
+        # Plain OPTIONS requests and unknown URLs go through normal dispatch,
+        # so they still get Flask's Allow header or a 404
+        if (request.method != 'OPTIONS' or request.url_rule is None
+                or 'Access-Control-Request-Method' not in request.headers):
+            return None
+
+        response = make_response('', 204)
+        origin = request.headers.get('Origin')
+        if origin in CORS_ORIGINS:
+            response.headers.update(_CORS_PREFLIGHT_HEADERS)
+            response.headers['Access-Control-Allow-Origin'] = origin
+        return response
 
     # Initialize database connection pool
     database.init_app(app)
@@ -52,34 +110,12 @@ def create_app(config_name=None):
     @app.route('/', methods=['GET'])
     def root():
         """Root endpoint with API information"""
-        return jsonify({
-            'name': 'Inventory Management API',
-            'version': '1.0.0',
-            'description': 'RESTful API for equipment inventory checkout system',
-            'endpoints': {
-                'inventory': {
-                    'get_inventory': 'GET /api/inventory?location={location}&ldap={ldap}',
-                    'search': 'GET /api/inventory/search?q={query}&location={location}',
-                    'get_item': 'GET /api/inventory/{item_id}'
-                },
-                'checkout': {
-                    'checkout': 'POST /api/checkout',
-                    'checkin': 'POST /api/checkout/checkin',
-                    'active': 'GET /api/checkout/active',
-                    'overdue': 'GET /api/checkout/overdue',
-                    'user_history': 'GET /api/checkout/user/{ldap}',
-                    'item_history': 'GET /api/checkout/item/{item_id}/history'
-                }
-            }
-        }), 200
+        return Response(_ROOT_BODY, 200, mimetype='application/json')
 
     @app.route('/health', methods=['GET'])
     def health_check():
         """Health check endpoint"""
-        return jsonify({
-            'status': 'healthy',
-            'database': 'connected'
-        }), 200
+        return Response(_HEALTH_BODY, 200, mimetype='application/json')
 
     return app
 
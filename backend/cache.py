@@ -0,0 +1,77 @@
+"""
+In-process caches for query results that rarely change
+Entries are process-local and expire after a fixed time-to-live
+"""
+
+import threading
+import time
+
+
+class TTLCache:
+    """Bounded key/value cache whose entries expire after `ttl` seconds"""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        """
+        Args:
+            maxsize (int): Maximum number of entries kept
+            ttl (float): Seconds an entry stays valid
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Get a cached value
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value, or None if missing or expired
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+
+            return value
+
+    def set(self, key, value):
+        """
+        Store a value, evicting the oldest entry when full
+
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        with self._lock:
+            self._data.pop(key, None)
+            if len(self._data) >= self.maxsize:
+                del self._data[next(iter(self._data))]
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def pop(self, key):
+        """
+        Remove a cached value
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The removed value, or None if it was not cached
+        """
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return entry[1] if entry else None
+
+    def clear(self):
+        """Remove all cached values"""
+        with self._lock:
+            self._data.clear()
@@ -19,24 +19,30 @@ class Config:
     DATABASE_URL = os.getenv('DATABASE_URL', 'postgresql://localhost:5432/inventory_management_db')
     DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
     DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+    # Replace connections after DB_POOL_RECYCLE seconds. Dead peers are caught by
+    # TCP keepalives; pre-ping costs a SELECT 1 round-trip per checkout, so it is opt-in
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'false').lower() == 'true'
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+
+    # Server-side limits applied to every pooled connection (milliseconds)
+    DB_APPLICATION_NAME = os.getenv('DB_APPLICATION_NAME', 'inventory_api')
+    DB_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT', '5000'))
+    DB_IDLE_IN_TRANSACTION_TIMEOUT = int(os.getenv('DB_IDLE_IN_TRANSACTION_TIMEOUT', '10000'))
 
     #
 
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
-    SQLALCHEMY_ECHO = True
 
 class ProductionConfig(Config):
     """Production configuration"""
     DEBUG = False
-    SQLALCHEMY_ECHO = False
 
 class TestConfig(Config):
     """Test configuration"""
     TESTING = True
     DEBUG = True
-    SQLALCHEMY_ECHO = True
 
 config = {
     'development': DevelopmentConfig,
@@ -3,19 +3,50 @@ Database connection manager for PostgreSQL
 Provides connection pooling and helper functions for database operations
 """
 
+import itertools
+import logging
+import re
+import time
+import weakref
+
 import psycopg2
 from psycopg2 import pool, extras
 from contextlib import contextmanager
-from flask import current_app, g
+from flask import current_app, g, has_app_context
+from cache import TTLCache
+
+
+logger = logging.getLogger(__name__)
+
+# Names of the statements already PREPAREd on each pooled connection
+_prepared_statements = weakref.WeakKeyDictionary()
+
+_PLACEHOLDER = re.compile(r'%s')
+_DSN_PASSWORD = re.compile(r'(://[^:/@]+:)[^@]*@')
+
+# Short-lived cache for expensive view-backed reads. Keys include a generation
+# number that writes bump, so results read before a write are never reused.
+_query_cache = TTLCache(maxsize=512, ttl=2)
+_query_cache_generations = itertools.count()
+_query_cache_generation = next(_query_cache_generations)
+
+# Unique names for server-side cursors opened by stream_query()
+_stream_cursor_ids = itertools.count()
+
+# When each pooled connection was first handed out, for pool_recycle
+_connection_born = weakref.WeakKeyDictionary()
 
 
 class Database:
     """Database connection pool manager"""
 
     _connection_pool = None
+    _pre_ping = False
+    _pool_recycle = None
 
     @classmethod
-    def initialize(cls, database_url, min_conn=1, max_conn=10):
+    def initialize(cls, database_url, min_conn=1, max_conn=10, pre_ping=False,
+                   pool_recycle=None, **connect_kwargs):
         """
         Initialize the connection pool
 
@@ -23,17 +54,24 @@ class Database:
             database_url (str): PostgreSQL connection string
             min_conn (int): Minimum number of connections
             max_conn (int): Maximum number of connections
+            pre_ping (bool): Check each connection with SELECT 1 before handing it out
+            pool_recycle (int): Replace connections older than this many seconds
+            **connect_kwargs: Extra connection parameters (options, keepalives, ...)
         """
+        cls._pre_ping = pre_ping
+        cls._pool_recycle = pool_recycle
         try:
-            cls._connection_pool = psycopg2.pool.SimpleConnectionPool(
+            # ThreadedConnectionPool is safe to share across Flask's worker threads
+            cls._connection_pool = psycopg2.pool.ThreadedConnectionPool(
                 min_conn,
                 max_conn,
-                database_url
+                dsn=database_url,
+                **connect_kwargs
             )
             if cls._connection_pool:
-                print("✓ Database connection pool created successfully")
+                logger.debug("Database connection pool created")
         except (Exception, psycopg2.DatabaseError) as error:
-            print(f"✗ Error creating connection pool: {error}")
+            logger.error("Error creating connection pool: %s", error)
             raise
 
     @classmethod
@@ -46,7 +84,45 @@ class Database:
         """
         if cls._connection_pool is None:
             raise Exception("Connection pool not initialized. Call initialize() first.")
-        return cls._connection_pool.getconn()
+
+        # Discard stale or broken connections; the pool opens fresh ones once
+        # its idle connections are used up
+        for _ in range(cls._connection_pool.maxconn + 1):
+            connection = cls._connection_pool.getconn()
+            if cls._is_usable(connection):
+                return connection
+            logger.debug("Discarding stale database connection")
+            cls._connection_pool.putconn(connection, close=True)
+        raise psycopg2.OperationalError("Could not obtain a usable database connection")
+
+    @classmethod
+    def _is_usable(cls, connection):
+        """
+        Check a pooled connection is open, not past pool_recycle and, with
+        pre_ping, still answering
+
+        Args:
+            connection: PostgreSQL connection object
+
+        Returns:
+            bool: True if the connection can be handed out
+        """
+        if connection.closed:
+            return False
+
+        now = time.monotonic()
+        born = _connection_born.setdefault(connection, now)
+        if cls._pool_recycle and now - born > cls._pool_recycle:
+            return False
+
+        if cls._pre_ping:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                connection.rollback()
+            except psycopg2.Error:
+                return False
+        return True
 
     @classmethod
     def return_connection(cls, connection):
@@ -64,7 +140,7 @@ class Database:
         """Close all connections in the pool"""
         if cls._connection_pool:
             cls._connection_pool.closeall()
-            print("✓ All database connections closed")
+            logger.debug("All database connections closed")
 
 
 @contextmanager
@@ -85,6 +161,22 @@ def get_db_connection():
         Database.return_connection(connection)
 
 
+def get_request_connection():
+    """
+    Get the connection bound to the current app context
+
+    The first call checks a connection out of the pool and keeps it on
+    `flask.g`, so every query in a request shares it. It is returned to
+    the pool when the app context tears down.
+
+    Returns:
+        connection: PostgreSQL connection object
+    """
+    if 'db_conn' not in g:
+        g.db_conn = Database.get_connection()
+    return g.db_conn
+
+
 @contextmanager
 def get_db_cursor(commit=False):
     """
@@ -93,25 +185,83 @@ def get_db_cursor(commit=False):
     Args:
         commit (bool): Whether to commit transaction on success
 
+    Inside a request the cursor uses the request's connection (see
+    get_request_connection); outside one it checks a connection out of
+    the pool for the duration of the block. A block nested inside another
+    in the same request joins the outer block's transaction: only the
+    outermost block commits or rolls back.
+
     Usage:
         with get_db_cursor(commit=True) as cursor:
             cursor.execute("INSERT INTO users ...")
     """
-    connection = Database.get_connection()
+    in_request = has_app_context()
+    if in_request:
+        connection = get_request_connection()
+        outermost = g.get('db_cursor_depth', 0) == 0
+        g.db_cursor_depth = g.get('db_cursor_depth', 0) + 1
+    else:
+        connection = Database.get_connection()
+        outermost = True
     cursor = connection.cursor(cursor_factory=extras.RealDictCursor)
     try:
         yield cursor
-        if commit:
+        if commit and outermost:
             connection.commit()
     except Exception as e:
-        connection.rollback()
+        if outermost:
+            connection.rollback()
         raise e
     finally:
         cursor.close()
-        Database.return_connection(connection)
+        if in_request:
+            g.db_cursor_depth -= 1
+        else:
+            Database.return_connection(connection)
 
 
-def execute_query(query, params=None, fetch_one=False, fetch_all=False, commit=False):
+def execute_prepared(cursor, name, query, params):
+    """
+    Execute a query as a server-side prepared statement
+
+    The statement is PREPAREd the first time it is used on the cursor's
+    connection and EXECUTEd by name afterwards, so PostgreSQL skips the
+    parse/plan step on repeated calls.
+
+    Args:
+        cursor: Database cursor
+        name (str): Prepared statement name
+        query (str): SQL query using %s placeholders
+        params (tuple): Positional query parameters
+    """
+    prepared = _prepared_statements.setdefault(cursor.connection, set())
+
+    if name not in prepared:
+        counter = iter(range(1, len(params) + 1))
+        positional = _PLACEHOLDER.sub(lambda _: f"${next(counter)}", query)
+        cursor.execute(f"PREPARE {name} AS {positional}")
+        prepared.add(name)
+
+    placeholders = ', '.join(['%s'] * len(params))
+    cursor.execute(f"EXECUTE {name} ({placeholders})", params)
+
+
+def invalidate_query_cache():
+    """Discard cached query results after a write"""
+    global _query_cache_generation
+    _query_cache_generation = next(_query_cache_generations)
+    _query_cache.clear()
+
+
+def _cache_key(query, params):
+    """Build a hashable cache key for a query and its parameters"""
+    if params:
+        params = tuple(tuple(p) if isinstance(p, list) else p for p in params)
+    return (_query_cache_generation, query, params)
+
+
+def execute_query(query, params=None, fetch_one=False, fetch_all=False, commit=False,
+                  prepared=None, cached=False):
     """
     Execute a database query with automatic connection handling
 
@@ -121,21 +271,63 @@ def execute_query(query, params=None, fetch_one=False, fetch_all=False, commit=F
         fetch_one (bool): Fetch single result
         fetch_all (bool): Fetch all results
         commit (bool): Commit transaction
+        prepared (str, optional): Run as the named server-side prepared statement
+        cached (bool): Serve a fetch_one/fetch_all read from the short-lived query cache
 
     Returns:
-        Result of query or None
+        Fetched row(s) when fetch_one/fetch_all is set, the affected row count
+        when committing, otherwise None. Use stream_query() for large reads.
     """
+    if cached and (fetch_one or fetch_all) and not commit:
+        key = (fetch_one,) + _cache_key(query, params)
+        rows = _query_cache.get(key)
+        if rows is None:
+            rows = execute_query(query, params, fetch_one=fetch_one, fetch_all=not fetch_one)
+            _query_cache.set(key, rows)
+        return rows
+
     with get_db_cursor(commit=commit) as cursor:
-        cursor.execute(query, params or ())
+        if prepared:
+            execute_prepared(cursor, prepared, query, tuple(params))
+        else:
+            cursor.execute(query, params or ())
 
         if fetch_one:
             return cursor.fetchone()
         elif fetch_all:
             return cursor.fetchall()
-        elif not commit:
-            return cursor.fetchall()
+        elif commit:
+            return cursor.rowcount
+
+        return None
+
+
+def stream_query(query, params=None, itersize=500):
+    """
+    Iterate over the rows of a large read without loading them all at once
+
+    Uses a named (server-side) cursor, which fetches `itersize` rows per
+    round-trip. The connection stays checked out until iteration finishes.
 
-        return cursor.rowcount
+    Args:
+        query (str): SQL query to execute
+        params (tuple/dict): Query parameters
+        itersize (int): Rows fetched per round-trip
+
+    Yields:
+        Result rows
+    """
+    connection = Database.get_connection()
+    cursor = connection.cursor(name=f"stream_{next(_stream_cursor_ids)}",
+                               cursor_factory=extras.RealDictCursor)
+    cursor.itersize = itersize
+    try:
+        cursor.execute(query, params or ())
+        yield from cursor
+    finally:
+        cursor.close()
+        connection.rollback()
+        Database.return_connection(connection)
 
 
 def init_app(app):
@@ -149,10 +341,47 @@ def init_app(app):
     min_conn = 1
     max_conn = app.config.get('DB_POOL_SIZE', 5) + app.config.get('DB_MAX_OVERFLOW', 10)
 
-    print(database_url)
-    Database.initialize(database_url, min_conn, max_conn)
+    # Let the server kill runaway queries and abandoned transactions so they
+    # cannot pin a pool slot, and detect dead peers via TCP keepalives
+    options = (
+        f"-c statement_timeout={app.config.get('DB_STATEMENT_TIMEOUT', 5000)} "
+        f"-c idle_in_transaction_session_timeout={app.config.get('DB_IDLE_IN_TRANSACTION_TIMEOUT', 10000)}"
+    )
+
+    logger.debug("Connecting to %s", _DSN_PASSWORD.sub(r'\1***@', database_url))
+    Database.initialize(
+        database_url,
+        min_conn,
+        max_conn,
+        pre_ping=app.config.get('DB_POOL_PRE_PING', False),
+        pool_recycle=app.config.get('DB_POOL_RECYCLE', 1800),
+        application_name=app.config.get('DB_APPLICATION_NAME', 'inventory_api'),
+        options=options,
+        keepalives=1,
+        keepalives_idle=30,
+        keepalives_interval=10,
+        keepalives_count=3
+    )
 
     @app.teardown_appcontext
     def shutdown_session(exception=None):
-        """Close database connections on app context teardown"""
-        pass  # Connections are returned to pool automatically via context managers
\ No newline at end of file
+        """
+        End the request's transaction and return its connection to the pool
+
+        Work left uncommitted is committed if the request succeeded and
+        rolled back if it raised.
+        """
+        g.pop('db_cursor_depth', None)
+        connection = g.pop('db_conn', None)
+        if connection is None:
+            return
+        try:
+            if exception is None:
+                connection.commit()
+            else:
+                connection.rollback()
+        except psycopg2.Error as error:
+            # putconn rolls back a connection left mid-transaction
+            logger.error("Error ending request transaction: %s", error)
+        finally:
+            Database.return_connection(connection)
\ No newline at end of file
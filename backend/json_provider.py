@@ -0,0 +1,40 @@
+"""
+orjson-backed JSON provider for Flask
+
+orjson encodes datetime, date and UUID values natively in C, so routes can
+hand query rows straight to jsonify without formatting each field.
+"""
+
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider using orjson, falling back to Flask's encoder for other types"""
+
+    option = orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, **kwargs):
+        """
+        Serialize data as a JSON string, sorting keys unless sort_keys is off
+
+        Args:
+            obj: Data to serialize
+
+        Returns:
+            str: JSON text
+        """
+        option = self.option | orjson.OPT_SORT_KEYS if self.sort_keys else self.option
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        """
+        Deserialize JSON text or bytes
+
+        Args:
+            s (str or bytes): JSON document
+
+        Returns:
+            Deserialized data
+        """
+        return orjson.loads(s)
@@ -0,0 +1,8 @@
+-- Indexes backing keyset pagination of the checkout history views
+-- (WHERE ... AND checkout_date < %s ORDER BY checkout_date DESC LIMIT %s)
+
+CREATE INDEX IF NOT EXISTS idx_checkout_history_user_checkout_date
+    ON inventory.checkout_history (user_id, checkout_date DESC);
+
+CREATE INDEX IF NOT EXISTS idx_checkout_history_item_checkout_date
+    ON inventory.checkout_history (item_id, checkout_date DESC);
@@ -0,0 +1,19 @@
+-- Link history rows to their checkout so check-in can match on checkout_id
+-- instead of comparing checkout_date timestamps
+
+ALTER TABLE inventory.checkout_history
+    ADD COLUMN IF NOT EXISTS checkout_id BIGINT;
+
+-- Backfill rows for checkouts that are still active
+UPDATE inventory.checkout_history h
+SET checkout_id = c.checkout_id
+FROM inventory.checkout c
+WHERE h.checkout_id IS NULL
+  AND h.is_returned = FALSE
+  AND h.item_id = c.item_id
+  AND h.user_id = c.user_id
+  AND ABS(EXTRACT(EPOCH FROM (h.checkout_date - c.checkout_date))) < 1;
+
+CREATE INDEX IF NOT EXISTS idx_checkout_history_unreturned_checkout_id
+    ON inventory.checkout_history (checkout_id)
+    WHERE is_returned = FALSE;
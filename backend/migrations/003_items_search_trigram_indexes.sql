@@ -0,0 +1,10 @@
+-- Trigram indexes so Item.search's ILIKE '%term%' predicates can use an index
+-- instead of scanning every item
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_items_item_name_trgm
+    ON inventory.items USING gin (item_name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_items_category_trgm
+    ON inventory.items USING gin (category gin_trgm_ops);
@@ -0,0 +1,6 @@
+-- Lets Checkout.get_overdue_checkouts range-scan overdue checkouts
+-- (WHERE expected_return_datetime < CURRENT_TIMESTAMP) instead of evaluating
+-- the view's computed is_overdue flag for every active checkout
+
+CREATE INDEX IF NOT EXISTS idx_checkout_expected_return_datetime
+    ON inventory.checkout (expected_return_datetime);
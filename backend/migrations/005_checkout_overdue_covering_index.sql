@@ -0,0 +1,12 @@
+-- Replace the plain expected_return_datetime index with a covering one, so
+-- Checkout.get_overdue_checkouts reads every checkout column it needs from
+-- the index and only touches users/items for the joins.
+--
+-- CONCURRENTLY avoids locking out checkouts while the index builds; run this
+-- file outside a transaction block (e.g. psql without --single-transaction).
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_checkout_overdue
+    ON inventory.checkout (expected_return_datetime)
+    INCLUDE (checkout_id, checkout_date, quantity, user_id, item_id);
+
+DROP INDEX CONCURRENTLY IF EXISTS inventory.idx_checkout_expected_return_datetime;
@@ -0,0 +1,12 @@
+-- History pages are now keyed on history_id
+-- (WHERE ... AND history_id < %s ORDER BY history_id DESC LIMIT %s),
+-- replacing the checkout_date indexes from 001
+
+CREATE INDEX IF NOT EXISTS idx_checkout_history_user_history_id
+    ON inventory.checkout_history (user_id, history_id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_checkout_history_item_history_id
+    ON inventory.checkout_history (item_id, history_id DESC);
+
+DROP INDEX IF EXISTS inventory.idx_checkout_history_user_checkout_date;
+DROP INDEX IF EXISTS inventory.idx_checkout_history_item_checkout_date;
@@ -0,0 +1,6 @@
+-- Lets Item.get_location_version compute MAX(updated_at) and COUNT(*) for a
+-- location from the index alone, so ETag checks on GET /api/inventory never
+-- read item rows
+
+CREATE INDEX IF NOT EXISTS idx_items_location_updated_at
+    ON inventory.items (location, updated_at);
@@ -0,0 +1,9 @@
+-- B-tree indexes for Item.search's short-query prefix match
+-- (lower(item_name) LIKE 'dr%'), which the trigram indexes from 003 cannot
+-- serve for patterns under three characters
+
+CREATE INDEX IF NOT EXISTS idx_items_item_name_lower_prefix
+    ON inventory.items (lower(item_name) text_pattern_ops);
+
+CREATE INDEX IF NOT EXISTS idx_items_category_lower_prefix
+    ON inventory.items (lower(category) text_pattern_ops);
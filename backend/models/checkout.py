@@ -2,10 +2,61 @@
 Checkout model for checkout/check-in operations
 """
 
-from database import execute_query, get_db_cursor
+from database import execute_query, get_db_cursor, invalidate_query_cache, stream_query
 from models.item import Item
-from models.user import User
-from datetime import datetime, timedelta
+
+
+_ACTIVE_CHECKOUTS_BASE_QUERY = """
+    SELECT checkout_id, checkout_date, expected_return_datetime, quantity,
+           ldap, full_name, email, item_id, item_name, category, location,
+           is_overdue, days_overdue, notes
+    FROM inventory.v_active_checkouts WHERE 1=1"""
+_ACTIVE_CHECKOUTS_ORDER = " ORDER BY checkout_date DESC"
+
+# Filter clause per (filter by user, filter by item) combination
+_ACTIVE_CHECKOUTS_FILTERS = {
+    (False, False): "",
+    (True, False): " AND user_id = ANY(%s::int[])",
+    (False, True): " AND item_id = ANY(%s::int[])",
+    (True, True): " AND user_id = ANY(%s::int[]) AND item_id = ANY(%s::int[])",
+}
+
+# Fixed query text per filter combination
+_ACTIVE_CHECKOUTS_QUERIES = {
+    key: _ACTIVE_CHECKOUTS_BASE_QUERY + where + _ACTIVE_CHECKOUTS_ORDER
+    for key, where in _ACTIVE_CHECKOUTS_FILTERS.items()
+}
+
+# Same reads with the rows aggregated into a JSON array by Postgres
+_ACTIVE_CHECKOUTS_JSON_QUERIES = {
+    key: ("SELECT COUNT(*) AS total,"
+          " COALESCE(json_agg(t ORDER BY t.checkout_date DESC), '[]')::text AS checkouts"
+          " FROM (" + _ACTIVE_CHECKOUTS_BASE_QUERY + where + ") t")
+    for key, where in _ACTIVE_CHECKOUTS_FILTERS.items()
+}
+
+
+def _active_checkouts_params(user_ids, item_ids):
+    """
+    Normalize active checkout filters
+
+    Args:
+        user_ids (int or list): User filter, None for all users
+        item_ids (int or list): Item filter, None for all items
+
+    Returns:
+        tuple: Query key for the filter combination and the query parameters,
+            or (None, None) when a filter is an empty list and nothing can match
+    """
+    if isinstance(user_ids, int):
+        user_ids = [user_ids]
+    if isinstance(item_ids, int):
+        item_ids = [item_ids]
+    if (user_ids is not None and not user_ids) or (item_ids is not None and not item_ids):
+        return None, None
+
+    params = tuple(list(ids) for ids in (user_ids, item_ids) if ids is not None) or None
+    return (user_ids is not None, item_ids is not None), params
 
 
 class Checkout:
@@ -21,7 +72,8 @@ class Checkout:
             item_id (int): Item ID
             user_id (int): User ID
             quantity (int): Quantity to checkout
-            expected_return_datetime (datetime): Expected return date/time
+            expected_return_datetime (datetime): Expected return date/time,
+                defaults to 7 days from now (computed by the database)
             checkout_condition (str): Condition of item at checkout
             notes (str): Checkout notes
 
@@ -31,42 +83,136 @@ class Checkout:
         Raises:
             ValueError: If item not available or user not found
         """
-        # Validate user exists
-        user = User.get_by_id(user_id)
-        if not user:
-            raise ValueError(f"User {user_id} not found")
+        with get_db_cursor(commit=True) as cursor:
+            checkout_record = Checkout._apply_checkout(
+                cursor, item_id, user_id, quantity, expected_return_datetime, checkout_condition, notes
+            )
+
+        invalidate_query_cache()
+        return checkout_record
+
+    @staticmethod
+    def checkout_items(checkouts):
+        """
+        Check out several items in a single transaction
+
+        Args:
+            checkouts (list): Dicts with item_id, user_id, quantity and optional
+                expected_return_datetime, checkout_condition, notes
+
+        Returns:
+            list: Checkout records, in request order
 
-        # Set default return datetime (7 days from now)
-        if expected_return_datetime is None:
-            expected_return_datetime = datetime.now() + timedelta(days=7)
+        Raises:
+            ValueError: If any user is not found or any item is not available;
+                nothing is checked out in that case
+        """
+        user_ids = list({c['user_id'] for c in checkouts})
 
         with get_db_cursor(commit=True) as cursor:
-            # Update item quantities (with row locking)
-            item = Item.update_quantities(item_id, quantity, is_checkout=True)
+            # Validate all users with one query
+            cursor.execute(
+                "SELECT user_id FROM inventory.users WHERE user_id = ANY(%s)",
+                (user_ids,)
+            )
+            found = {row['user_id'] for row in cursor.fetchall()}
+            missing = [user_id for user_id in user_ids if user_id not in found]
+            if missing:
+                raise ValueError(f"User {missing[0]} not found")
+
+            records = [
+                Checkout._apply_checkout(
+                    cursor,
+                    c['item_id'],
+                    c['user_id'],
+                    c['quantity'],
+                    c.get('expected_return_datetime'),
+                    c.get('checkout_condition', 'good'),
+                    c.get('notes')
+                )
+                for c in checkouts
+            ]
 
-            # Create checkout record
-            cursor.execute("""
+        invalidate_query_cache()
+        return records
+
+    @staticmethod
+    def _apply_checkout(cursor, item_id, user_id, quantity, expected_return_datetime,
+                        checkout_condition, notes):
+        """
+        Check out an item on an existing cursor, inside the caller's transaction
+
+        Validates the user, reserves the quantity and inserts the checkout and
+        its history row in a single statement. The quantity guard sits in the
+        UPDATE itself, so concurrent checkouts cannot oversell an item.
+
+        Returns:
+            dict: Checkout record
+
+        Raises:
+            ValueError: If the user or item is not found, or quantity is insufficient
+        """
+        cursor.execute("""
+            WITH reserved AS (
+                UPDATE inventory.items
+                SET quantity_available = quantity_available - %(quantity)s,
+                    quantity_checked_out = quantity_checked_out + %(quantity)s,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE item_id = %(item_id)s
+                  AND quantity_available >= %(quantity)s
+                  AND EXISTS (SELECT 1 FROM inventory.users WHERE user_id = %(user_id)s)
+                RETURNING item_id
+            ), new_checkout AS (
                 INSERT INTO inventory.checkout (
                     item_id, user_id, quantity, checkout_date,
                     expected_return_datetime, checkout_condition, notes
                 )
-                VALUES (%s, %s, %s, CURRENT_TIMESTAMP, %s, %s, %s)
+                SELECT item_id, %(user_id)s, %(quantity)s, CURRENT_TIMESTAMP,
+                       COALESCE(%(expected_return)s, CURRENT_TIMESTAMP + INTERVAL '7 days'),
+                       %(condition)s, %(notes)s
+                FROM reserved
                 RETURNING checkout_id, item_id, user_id, quantity, checkout_date,
                           expected_return_datetime, checkout_condition, notes, created_at
-            """, (item_id, user_id, quantity, expected_return_datetime, checkout_condition, notes))
-            checkout_record = cursor.fetchone()
-
-            # Add to history
-            cursor.execute("""
+            ), new_history AS (
                 INSERT INTO inventory.checkout_history (
-                    item_id, user_id, quantity, checkout_date,
+                    checkout_id, item_id, user_id, quantity, checkout_date,
                     expected_return_datetime, checkout_condition,
                     checkout_notes, is_returned
                 )
-                VALUES (%s, %s, %s, CURRENT_TIMESTAMP, %s, %s, %s, FALSE)
-            """, (item_id, user_id, quantity, expected_return_datetime, checkout_condition, notes))
-
-            return checkout_record
+                SELECT checkout_id, item_id, user_id, quantity, checkout_date,
+                       expected_return_datetime, checkout_condition,
+                       notes, FALSE
+                FROM new_checkout
+            )
+            SELECT * FROM new_checkout
+        """, {
+            'item_id': item_id,
+            'user_id': user_id,
+            'quantity': quantity,
+            'expected_return': expected_return_datetime,
+            'condition': checkout_condition,
+            'notes': notes
+        })
+        checkout_record = cursor.fetchone()
+
+        if not checkout_record:
+            # Nothing inserted: work out which check failed
+            cursor.execute("""
+                SELECT EXISTS (SELECT 1 FROM inventory.users WHERE user_id = %s) AS user_found,
+                       (SELECT quantity_available FROM inventory.items WHERE item_id = %s)
+                           AS quantity_available
+            """, (user_id, item_id))
+            state = cursor.fetchone()
+
+            if not state['user_found']:
+                raise ValueError(f"User {user_id} not found")
+            if state['quantity_available'] is None:
+                raise ValueError(f"Item {item_id} not found")
+            raise ValueError(
+                f"Insufficient quantity. Available: {state['quantity_available']}, Requested: {quantity}"
+            )
+
+        return checkout_record
 
     @staticmethod
     def checkin_item(checkout_id, return_condition='good', return_notes=None):
@@ -97,70 +243,73 @@ class Checkout:
             if not checkout:
                 raise ValueError(f"Checkout {checkout_id} not found")
 
-            # Update item quantities (return to inventory)
-            Item.update_quantities(checkout['item_id'], checkout['quantity'], is_checkout=False)
+            # Update item quantities (return to inventory) in the same transaction
+            Item.change_quantities(cursor, checkout['item_id'], checkout['quantity'], is_checkout=False)
 
             # Remove from active checkouts
             cursor.execute("DELETE FROM inventory.checkout WHERE checkout_id = %s", (checkout_id,))
 
-            # Update history
-            is_late = datetime.now() > checkout['expected_return_datetime']
-
+            # Update history, judging lateness by the database clock
             cursor.execute("""
                 UPDATE inventory.checkout_history
                 SET return_date = CURRENT_TIMESTAMP,
                     return_condition = %s,
                     return_notes = %s,
                     is_returned = TRUE,
-                    late_return = %s,
+                    late_return = (CURRENT_TIMESTAMP > expected_return_datetime),
                     updated_at = CURRENT_TIMESTAMP
-                WHERE item_id = %s
-                  AND user_id = %s
+                WHERE checkout_id = %s
                   AND is_returned = FALSE
-                  AND ABS(EXTRACT(EPOCH FROM (checkout_date - %s))) < 1
                 RETURNING history_id, item_id, user_id, quantity, checkout_date,
                           return_date, expected_return_datetime, is_returned, late_return,
                           checkout_condition, return_condition, checkout_notes, return_notes
-            """, (return_condition, return_notes, is_late,
-                  checkout['item_id'], checkout['user_id'], checkout['checkout_date']))
+            """, (return_condition, return_notes, checkout_id))
 
             result = cursor.fetchone()
 
             if not result:
                 raise ValueError(
                     f"Failed to update checkout history. No matching unreturned checkout found for "
-                    f"item_id={checkout['item_id']}, user_id={checkout['user_id']}, "
-                    f"checkout_date={checkout['checkout_date']}"
+                    f"checkout_id={checkout_id}"
                 )
 
-            return result
+        invalidate_query_cache()
+        return result
 
     @staticmethod
-    def get_active_checkouts(user_id=None, item_id=None):
+    def get_active_checkouts(user_ids=None, item_ids=None):
         """
         Get active checkouts
 
         Args:
-            user_id (int, optional): Filter by user
-            item_id (int, optional): Filter by item
+            user_ids (int or list, optional): Filter by one or more users; an empty list matches none
+            item_ids (int or list, optional): Filter by one or more items; an empty list matches none
 
         Returns:
             list: List of active checkouts
         """
-        query = "SELECT * FROM inventory.v_active_checkouts WHERE 1=1"
-        params = []
-
-        if user_id:
-            query += " AND user_id = %s"
-            params.append(user_id)
+        key, params = _active_checkouts_params(user_ids, item_ids)
+        if key is None:
+            return []
+        return execute_query(_ACTIVE_CHECKOUTS_QUERIES[key], params, fetch_all=True, cached=True)
 
-        if item_id:
-            query += " AND item_id = %s"
-            params.append(item_id)
+    @staticmethod
+    def get_active_checkouts_json(user_ids=None, item_ids=None):
+        """
+        Get active checkouts as a JSON array encoded by the database
 
-        query += " ORDER BY checkout_date DESC"
+        Args:
+            user_ids (int or list, optional): Filter by one or more users; an empty list matches none
+            item_ids (int or list, optional): Filter by one or more items; an empty list matches none
 
-        return execute_query(query, tuple(params) if params else None, fetch_all=True)
+        Returns:
+            tuple: Number of active checkouts and the JSON array text
+        """
+        key, params = _active_checkouts_params(user_ids, item_ids)
+        if key is None:
+            return 0, '[]'
+        row = execute_query(_ACTIVE_CHECKOUTS_JSON_QUERIES[key], params, fetch_one=True, cached=True)
+        return row['total'], row['checkouts']
 
     @staticmethod
     def get_overdue_checkouts():
@@ -170,57 +319,142 @@ class Checkout:
         Returns:
             list: List of overdue checkouts
         """
+        # Filter the base table on expected_return_datetime rather than the view's
+        # computed is_overdue flag, which no index can serve. idx_checkout_overdue
+        # covers the checkout columns, and days_overdue is computed by Postgres.
         query = """
-            SELECT * FROM inventory.v_active_checkouts
-            WHERE is_overdue = TRUE
-            ORDER BY days_overdue DESC
+            SELECT c.checkout_id, c.checkout_date, c.expected_return_datetime,
+                   c.quantity, u.ldap, u.full_name, u.email,
+                   i.item_id, i.item_name, i.location,
+                   EXTRACT(DAY FROM (CURRENT_TIMESTAMP - c.expected_return_datetime))::int AS days_overdue
+            FROM inventory.checkout c
+            JOIN inventory.users u ON u.user_id = c.user_id
+            JOIN inventory.items i ON i.item_id = c.item_id
+            WHERE c.expected_return_datetime < CURRENT_TIMESTAMP
+            ORDER BY c.expected_return_datetime ASC
         """
-        return execute_query(query, fetch_all=True)
+        return execute_query(query, fetch_all=True, cached=True)
 
     @staticmethod
-    def get_user_checkout_history(user_id, limit=50):
+    def get_user_checkout_history(user_id, limit=50, before_id=None, stream=False):
         """
         Get checkout history for a specific user
 
         Args:
             user_id (int): User ID
             limit (int): Max results
+            before_id (int, optional): Only return records with a lower history_id.
+                Pass the last row's history_id to fetch the next page.
+            stream (bool): Iterate rows from a server-side cursor instead of
+                loading them all; streamed reads bypass the query cache
 
         Returns:
-            list: List of checkout history records
+            list: List of checkout history records (an iterator when streaming)
         """
-        # First get user's ldap
-        user = User.get_by_id(user_id)
-        if not user:
-            return []
+        # Resolve the user's ldap in the same statement
+        query = """
+            SELECT h.history_id, h.checkout_date, h.return_date,
+                   h.expected_return_datetime, h.quantity, h.is_returned,
+                   h.late_return, h.item_id, h.item_name, h.category, h.location,
+                   h.checkout_condition, h.return_condition
+            FROM inventory.v_checkout_history h
+            JOIN inventory.users u ON u.ldap = h.ldap
+            WHERE u.user_id = %s
+        """
+        params = [user_id]
+
+        if before_id:
+            query += " AND h.history_id < %s"
+            params.append(before_id)
+
+        query += " ORDER BY h.history_id DESC LIMIT %s"
+        params.append(limit)
+
+        if stream:
+            return stream_query(query, tuple(params))
+        return execute_query(query, tuple(params), fetch_all=True, cached=True)
 
+    @staticmethod
+    def get_user_checkout_history_by_ldap(ldap, limit=50, before_id=None, stream=False):
+        """
+        Get a user and their checkout history in one query
+
+        Every row carries the user's user_ldap and user_full_name. A user with
+        no history yields a single row whose history columns are NULL; an
+        unknown or inactive user yields no rows.
+
+        Args:
+            ldap (str): LDAP username
+            limit (int): Max results
+            before_id (int, optional): Only return records with a lower history_id.
+                Pass the last row's history_id to fetch the next page.
+            stream (bool): Iterate rows from a server-side cursor instead of
+                loading them all; streamed reads bypass the query cache
+
+        Returns:
+            list: List of checkout history records (an iterator when streaming)
+        """
         query = """
-            SELECT * FROM inventory.v_checkout_history
-            WHERE ldap = %s
-            ORDER BY checkout_date DESC
-            LIMIT %s
+            WITH u AS (
+                SELECT ldap, full_name FROM inventory.users
+                WHERE ldap = %s AND active = TRUE
+            )
+            SELECT u.ldap AS user_ldap, u.full_name AS user_full_name,
+                   h.history_id, h.checkout_date, h.return_date,
+                   h.expected_return_datetime, h.quantity, h.is_returned,
+                   h.late_return, h.item_id, h.item_name, h.category, h.location,
+                   h.checkout_condition, h.return_condition
+            FROM u
+            LEFT JOIN inventory.v_checkout_history h ON h.ldap = u.ldap
         """
-        return execute_query(query, (user['ldap'], limit), fetch_all=True)
+        params = [ldap]
+
+        if before_id:
+            query += " AND h.history_id < %s"
+            params.append(before_id)
+
+        query += " ORDER BY h.history_id DESC NULLS LAST LIMIT %s"
+        params.append(limit)
+
+        if stream:
+            return stream_query(query, tuple(params))
+        return execute_query(query, tuple(params), fetch_all=True, cached=True)
 
     @staticmethod
-    def get_item_checkout_history(item_id, limit=50):
+    def get_item_checkout_history(item_id, limit=50, before_id=None, stream=False):
         """
         Get checkout history for a specific item
 
         Args:
             item_id (int): Item ID
             limit (int): Max results
+            before_id (int, optional): Only return records with a lower history_id.
+                Pass the last row's history_id to fetch the next page.
+            stream (bool): Iterate rows from a server-side cursor instead of
+                loading them all; streamed reads bypass the query cache
 
         Returns:
-            list: List of checkout history records
+            list: List of checkout history records (an iterator when streaming)
         """
         query = """
-            SELECT * FROM inventory.v_checkout_history
+            SELECT history_id, checkout_date, return_date, expected_return_datetime,
+                   quantity, is_returned, late_return, ldap, full_name,
+                   checkout_condition, return_condition, checkout_notes, return_notes
+            FROM inventory.v_checkout_history
             WHERE item_id = %s
-            ORDER BY checkout_date DESC
-            LIMIT %s
         """
-        return execute_query(query, (item_id, limit), fetch_all=True)
+        params = [item_id]
+
+        if before_id:
+            query += " AND history_id < %s"
+            params.append(before_id)
+
+        query += " ORDER BY history_id DESC LIMIT %s"
+        params.append(limit)
+
+        if stream:
+            return stream_query(query, tuple(params))
+        return execute_query(query, tuple(params), fetch_all=True, cached=True)
 
     @staticmethod
     def get_checkout_by_id(checkout_id):
@@ -237,4 +471,4 @@ class Checkout:
             SELECT * FROM inventory.v_active_checkouts
             WHERE checkout_id = %s
         """
-        return execute_query(query, (checkout_id,), fetch_one=True)
\ No newline at end of file
+        return execute_query(query, (checkout_id,), fetch_one=True, prepared='checkout_by_id')
\ No newline at end of file
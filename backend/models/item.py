@@ -2,7 +2,34 @@
 Item model for inventory database operations
 """
 
-from database import execute_query, get_db_cursor
+from database import execute_query, get_db_cursor, invalidate_query_cache
+
+
+_SEARCH_COLUMNS = """
+    SELECT item_id, item_name, category, location, quantity_available,
+           condition, status
+    FROM inventory.items
+"""
+
+# Substring match, served by the pg_trgm GIN indexes
+_SEARCH_SUBSTRING_WHERE = "WHERE (item_name ILIKE %s OR category ILIKE %s)"
+
+# Case-insensitive prefix match, served by the lower(...) text_pattern_ops indexes
+_SEARCH_PREFIX_WHERE = "WHERE (lower(item_name) LIKE %s OR lower(category) LIKE %s)"
+
+# Fixed query text per (prefix match, filter by location) combination,
+# so no string building per call
+_SEARCH_QUERIES = {
+    (prefix, by_location): (_SEARCH_COLUMNS
+                            + (_SEARCH_PREFIX_WHERE if prefix else _SEARCH_SUBSTRING_WHERE)
+                            + (" AND location = %s" if by_location else "")
+                            + " ORDER BY item_name")
+    for prefix in (False, True)
+    for by_location in (False, True)
+}
+
+# Trigram indexes only help with patterns of at least three characters
+_TRIGRAM_MIN_LENGTH = 3
 
 
 class Item:
@@ -17,20 +44,45 @@ class Item:
             location (str): Location name
 
         Returns:
-            list: List of item records
+            list: List of item records, including a computed availability_status
         """
         query = """
             SELECT item_id, item_name, category, location,
                    quantity_total, quantity_available, quantity_checked_out,
-                   purchase_price, restock_date, condition, status,
-                   last_audit_date, notes, image_url,
-                   created_at, updated_at
+                   purchase_price::float8 AS purchase_price, condition, status,
+                   notes, image_url,
+                   CASE
+                       WHEN quantity_available = 0 THEN 'Out of Stock'
+                       WHEN quantity_available < quantity_total * 0.2 THEN 'Low Stock'
+                       ELSE 'Available'
+                   END AS availability_status
             FROM inventory.items
             WHERE location = %s
             ORDER BY item_name
         """
         return execute_query(query, (location,), fetch_all=True)
 
+    @staticmethod
+    def get_location_version(location):
+        """
+        Get a cheap fingerprint of a location's inventory
+
+        Any insert, update or delete changes the latest updated_at or the
+        item count, so this is enough to build an ETag without reading items.
+
+        Args:
+            location (str): Location name
+
+        Returns:
+            dict: last_updated (datetime or None) and item_count
+        """
+        query = """
+            SELECT MAX(updated_at) AS last_updated, COUNT(*) AS item_count
+            FROM inventory.items
+            WHERE location = %s
+        """
+        return execute_query(query, (location,), fetch_one=True, prepared='item_location_version')
+
     @staticmethod
     def get_by_id(item_id):
         """
@@ -51,7 +103,7 @@ class Item:
             FROM inventory.items
             WHERE item_id = %s
         """
-        return execute_query(query, (item_id,), fetch_one=True)
+        return execute_query(query, (item_id,), fetch_one=True, prepared='item_by_id')
 
     @staticmethod
     def get_available_items(location=None):
@@ -86,30 +138,28 @@ class Item:
         """
         Search items by name or category
 
+        Queries shorter than three characters match as a prefix, since the
+        trigram indexes cannot serve them as a substring search; the prefix
+        form compares lower() values so a b-tree index can serve it instead.
+
         Args:
             query_text (str): Search query
             location (str, optional): Filter by location
 
         Returns:
-            list: List of matching items
-        """
-        query = """
-            SELECT item_id, item_name, category, location,
-                   quantity_total, quantity_available, quantity_checked_out,
-                   purchase_price, condition, status, notes, image_url
-            FROM inventory.items
-            WHERE (item_name ILIKE %s OR category ILIKE %s)
+            list: List of matching items, with the columns the search endpoint returns
         """
-        search_pattern = f"%{query_text}%"
-        params = [search_pattern, search_pattern]
+        prefix = len(query_text) < _TRIGRAM_MIN_LENGTH
+        if prefix:
+            search_pattern = f"{query_text.lower()}%"
+        else:
+            search_pattern = f"%{query_text}%"
 
+        params = (search_pattern, search_pattern)
         if location:
-            query += " AND location = %s"
-            params.append(location)
-
-        query += " ORDER BY item_name"
+            params += (location,)
 
-        return execute_query(query, tuple(params), fetch_all=True)
+        return execute_query(_SEARCH_QUERIES[(prefix, bool(location))], params, fetch_all=True)
 
     @staticmethod
     def update_quantities(item_id, quantity_change, is_checkout=True):
@@ -128,9 +178,56 @@ class Item:
             ValueError: If insufficient quantity available
         """
         with get_db_cursor(commit=True) as cursor:
-            # Lock row for update
+            updated = Item.change_quantities(cursor, item_id, quantity_change, is_checkout)
+
+        invalidate_query_cache()
+        return updated
+
+    @staticmethod
+    def change_quantities(cursor, item_id, quantity_change, is_checkout=True):
+        """
+        Update item quantities on an existing cursor, inside the caller's transaction
+
+        Args:
+            cursor: Database cursor
+            item_id (int): Item ID
+            quantity_change (int): Quantity to add/subtract
+            is_checkout (bool): True for checkout (decrease available), False for checkin (increase available)
+
+        Returns:
+            dict: Updated item record
+
+        Raises:
+            ValueError: If item not found or quantity insufficient
+        """
+        # Guard the quantity in the UPDATE itself so no separate row lock is needed
+        if is_checkout:
+            # Checkout: decrease available, increase checked_out
+            cursor.execute("""
+                UPDATE inventory.items
+                SET quantity_available = quantity_available - %s,
+                    quantity_checked_out = quantity_checked_out + %s,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE item_id = %s AND quantity_available >= %s
+                RETURNING item_id, item_name, quantity_total, quantity_available, quantity_checked_out
+            """, (quantity_change, quantity_change, item_id, quantity_change))
+        else:
+            # Check-in: increase available, decrease checked_out
+            cursor.execute("""
+                UPDATE inventory.items
+                SET quantity_available = quantity_available + %s,
+                    quantity_checked_out = quantity_checked_out - %s,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE item_id = %s AND quantity_checked_out >= %s
+                RETURNING item_id, item_name, quantity_total, quantity_available, quantity_checked_out
+            """, (quantity_change, quantity_change, item_id, quantity_change))
+
+        updated = cursor.fetchone()
+
+        if not updated:
+            # No row updated: work out whether the item is missing or short
             cursor.execute(
-                "SELECT quantity_available, quantity_checked_out FROM inventory.items WHERE item_id = %s FOR UPDATE",
+                "SELECT quantity_available, quantity_checked_out FROM inventory.items WHERE item_id = %s",
                 (item_id,)
             )
             item = cursor.fetchone()
@@ -139,37 +236,15 @@ class Item:
                 raise ValueError(f"Item {item_id} not found")
 
             if is_checkout:
-                # Checkout: decrease available, increase checked_out
-                if item['quantity_available'] < quantity_change:
-                    raise ValueError(
-                        f"Insufficient quantity. Available: {item['quantity_available']}, Requested: {quantity_change}"
-                    )
-
-                cursor.execute("""
-                    UPDATE inventory.items
-                    SET quantity_available = quantity_available - %s,
-                        quantity_checked_out = quantity_checked_out + %s,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE item_id = %s
-                    RETURNING item_id, item_name, quantity_total, quantity_available, quantity_checked_out
-                """, (quantity_change, quantity_change, item_id))
-            else:
-                # Check-in: increase available, decrease checked_out
-                if item['quantity_checked_out'] < quantity_change:
-                    raise ValueError(
-                        f"Cannot check in {quantity_change} items. Only {item['quantity_checked_out']} currently checked out"
-                    )
-
-                cursor.execute("""
-                    UPDATE inventory.items
-                    SET quantity_available = quantity_available + %s,
-                        quantity_checked_out = quantity_checked_out - %s,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE item_id = %s
-                    RETURNING item_id, item_name, quantity_total, quantity_available, quantity_checked_out
-                """, (quantity_change, quantity_change, item_id))
-
-            return cursor.fetchone()
+                raise ValueError(
+                    f"Insufficient quantity. Available: {item['quantity_available']}, Requested: {quantity_change}"
+                )
+
+            raise ValueError(
+                f"Cannot check in {quantity_change} items. Only {item['quantity_checked_out']} currently checked out"
+            )
+
+        return updated
 
     @staticmethod
     def create(item_name, category, location, quantity_total, **kwargs):
@@ -214,7 +289,10 @@ class Item:
 
         with get_db_cursor(commit=True) as cursor:
             cursor.execute(query, params)
-            return cursor.fetchone()
+            item = cursor.fetchone()
+
+        invalidate_query_cache()
+        return item
 
     @staticmethod
     def update(item_id, **kwargs):
@@ -252,4 +330,8 @@ class Item:
 
         with get_db_cursor(commit=True) as cursor:
             cursor.execute(query, values)
-            return cursor.fetchone()
\ No newline at end of file
+            updated = cursor.fetchone()
+
+        # Cached checkout reads join in item_name
+        invalidate_query_cache()
+        return updated
\ No newline at end of file
@@ -2,7 +2,51 @@
 User model for database operations
 """
 
-from database import execute_query, get_db_cursor
+from flask import g, has_app_context
+
+from database import execute_query, get_db_cursor, invalidate_query_cache
+from cache import TTLCache
+
+
+# User rows rarely change, so lookups by id/ldap are cached briefly per process
+_user_cache = TTLCache(maxsize=1024, ttl=60)
+
+
+def _request_users():
+    """Return the per-request user lookup dict, or None outside an app context"""
+    if not has_app_context():
+        return None
+    if 'user_lookups' not in g:
+        g.user_lookups = {}
+    return g.user_lookups
+
+
+def _cached_lookup(key, query, params, prepared):
+    """
+    Look a user up through the per-request and process-wide caches
+
+    Args:
+        key (tuple): Cache key, e.g. ('ldap', 'jdoe')
+        query (str): SQL query fetching one user
+        params (tuple): Query parameters
+        prepared (str): Prepared statement name
+
+    Returns:
+        dict: User record or None
+    """
+    request_users = _request_users()
+    if request_users is not None and key in request_users:
+        return request_users[key]
+
+    user = _user_cache.get(key)
+    if user is None:
+        user = execute_query(query, params, fetch_one=True, prepared=prepared)
+        if user:
+            _user_cache.set(key, user)
+
+    if request_users is not None and user:
+        request_users[key] = user
+    return user
 
 
 class User:
@@ -25,7 +69,27 @@ class User:
             FROM inventory.users
             WHERE ldap = %s AND active = TRUE
         """
-        return execute_query(query, (ldap,), fetch_one=True)
+        return _cached_lookup(('ldap', ldap), query, (ldap,), 'user_by_ldap')
+
+    @staticmethod
+    def get_by_ldaps(ldaps):
+        """
+        Get several active users by LDAP username in one query
+
+        Args:
+            ldaps (list): LDAP usernames
+
+        Returns:
+            dict: User records keyed by LDAP username; unknown names are absent
+        """
+        query = """
+            SELECT user_id, ldap, full_name, email, role, department, active,
+                   created_at, updated_at
+            FROM inventory.users
+            WHERE ldap = ANY(%s) AND active = TRUE
+        """
+        users = execute_query(query, (list(ldaps),), fetch_all=True)
+        return {user['ldap']: user for user in users}
 
     @staticmethod
     def get_by_id(user_id):
@@ -44,7 +108,7 @@ class User:
             FROM inventory.users
             WHERE user_id = %s
         """
-        return execute_query(query, (user_id,), fetch_one=True)
+        return _cached_lookup(('id', user_id), query, (user_id,), 'user_by_id')
 
     @staticmethod
     def create(ldap, full_name, email=None, role='employee', department=None):
@@ -69,7 +133,10 @@ class User:
         """
         with get_db_cursor(commit=True) as cursor:
             cursor.execute(query, (ldap, full_name, email, role, department))
-            return cursor.fetchone()
+            user = cursor.fetchone()
+        User.invalidate_cache(user['user_id'], ldap)
+        invalidate_query_cache()
+        return user
 
     @staticmethod
     def get_all(active_only=True):
@@ -125,7 +192,36 @@ class User:
 
         with get_db_cursor(commit=True) as cursor:
             cursor.execute(query, values)
-            return cursor.fetchone()
+            result = cursor.fetchone()
+
+        User.invalidate_cache(user_id, result['ldap'] if result else None)
+        # Cached checkout reads join in the user's name and active flag
+        invalidate_query_cache()
+        return result
+
+    @staticmethod
+    def invalidate_cache(user_id, ldap=None):
+        """
+        Drop cached lookups for a user
+
+        Args:
+            user_id (int): User ID
+            ldap (str, optional): LDAP username, if known
+        """
+        request_users = _request_users()
+        keys = [('id', user_id)]
+        cached = _user_cache.get(('id', user_id))
+        if cached is None and request_users is not None:
+            cached = request_users.get(('id', user_id))
+        if cached:
+            keys.append(('ldap', cached['ldap']))
+        if ldap:
+            keys.append(('ldap', ldap))
+
+        for key in keys:
+            _user_cache.pop(key)
+            if request_users is not None:
+                request_users.pop(key, None)
 
     @staticmethod
     def deactivate(user_id):
@@ -3,13 +3,167 @@ Checkout routes for checking equipment in and out
 Handles checkout, check-in, and viewing active/historical checkouts
 """
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
 from models.checkout import Checkout
 from models.user import User
 from datetime import datetime
+from itertools import chain
 
 checkout_bp = Blueprint('checkout_bp', __name__, url_prefix='/api/checkout')
 
+# Upper bound on the history rows a single request may ask for
+MAX_HISTORY_LIMIT = 1000
+
+
+def _parse_expected_return(value):
+    """Parse an ISO 8601 expected_return_datetime, or None if not given"""
+    if not value:
+        return None
+    try:
+        # fromisoformat only accepts a trailing 'Z' from Python 3.11
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError('expected_return_datetime must be an ISO 8601 date/time')
+
+
+def _json_body():
+    """
+    Parse the request's JSON body without raising Flask's HTML BadRequest
+
+    Returns:
+        The decoded body, or None if the request has no body
+
+    Raises:
+        ValueError: If a body was sent but is not valid JSON
+    """
+    data = request.get_json(silent=True)
+    # get_json caches the raw body, so this does not read the stream again
+    if data is None and request.get_data():
+        raise ValueError('Invalid JSON body')
+    return data
+
+
+def _positive_int(data, field, default=None):
+    """
+    Read a positive integer field from a request body
+
+    Args:
+        data (dict): Request body
+        field (str): Field name
+        default (int, optional): Value when the field is absent
+
+    Returns:
+        int: Field value
+
+    Raises:
+        ValueError: If the value is not a positive integer
+    """
+    value = data.get(field, default)
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f'{field} must be a positive integer')
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError(f'{field} must be a positive integer')
+    if value < 1:
+        raise ValueError(f'{field} must be a positive integer')
+    return value
+
+
+def _parse_checkout_request(data):
+    """
+    Validate and coerce one checkout request body
+
+    Args:
+        data (dict): Request body, as documented on POST /api/checkout
+
+    Returns:
+        dict: item_id, user_id (None when only user_ldap is given), user_ldap,
+            quantity, expected_return_datetime, checkout_condition and notes
+
+    Raises:
+        ValueError: If a field is missing or invalid
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Checkout must be a JSON object')
+    if not data.get('item_id'):
+        raise ValueError('item_id is required')
+    if not data.get('user_ldap') and not data.get('user_id'):
+        raise ValueError('Either user_ldap or user_id is required')
+
+    return {
+        'item_id': _positive_int(data, 'item_id'),
+        'user_id': _positive_int(data, 'user_id') if data.get('user_id') else None,
+        'user_ldap': data.get('user_ldap'),
+        'quantity': _positive_int(data, 'quantity', 1),
+        'expected_return_datetime': _parse_expected_return(data.get('expected_return_datetime')),
+        'checkout_condition': data.get('checkout_condition', 'good'),
+        'notes': data.get('notes')
+    }
+
+
+def _history_limit():
+    """Read the `limit` query parameter, capped at MAX_HISTORY_LIMIT"""
+    return min(request.args.get('limit', default=50, type=int), MAX_HISTORY_LIMIT)
+
+
+def _stream_history(head, rows, limit):
+    """
+    Stream a JSON object holding `head` plus a "history" array of `rows`
+
+    The first row is fetched before the response starts, so query errors
+    still surface as a normal error response. total_records and next_cursor
+    are written after the array, once the rows have been counted.
+    next_cursor is the last row's history_id when the page is full (pass it
+    back as before_id), otherwise null.
+
+    Args:
+        head (dict): Leading response fields
+        rows (iterable): History rows, newest first
+        limit (int): Page size the rows were fetched with
+
+    Returns:
+        Response: Streaming JSON response
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    rows = chain((first,), rows) if first is not None else ()
+    dumps = current_app.json.dumps
+
+    def generate():
+        yield dumps(head)[:-1] + ',"history":['
+        count = 0
+        last_id = None
+        for row in rows:
+            yield (',' if count else '') + dumps(row)
+            count += 1
+            last_id = row['history_id']
+        next_cursor = dumps(last_id if count == limit else None)
+        yield f'],"total_records":{count},"next_cursor":{next_cursor}}}'
+
+    return Response(stream_with_context(generate()), 200, mimetype='application/json')
+
+
+def _without_user(rows):
+    """Drop the user columns repeated on every joined user history row"""
+    for row in rows:
+        del row['user_ldap'], row['user_full_name']
+        yield row
+
+
+def _serialize_checkout(checkout_record):
+    """Format a checkout record for a JSON response"""
+    return {
+        'checkout_id': checkout_record['checkout_id'],
+        'item_id': checkout_record['item_id'],
+        'user_id': checkout_record['user_id'],
+        'quantity': checkout_record['quantity'],
+        'checkout_date': checkout_record['checkout_date'].isoformat(),
+        'expected_return_datetime': checkout_record['expected_return_datetime'].isoformat(),
+        'checkout_condition': checkout_record['checkout_condition'],
+        'notes': checkout_record['notes']
+    }
+
 
 @checkout_bp.route('', methods=['POST'])
 def checkout_item():
@@ -33,61 +187,29 @@ def checkout_item():
         POST /api/checkout
     """
     try:
-        data = request.get_json()
+        data = _json_body()
 
         if not data:
             return jsonify({'error': 'No data provided'}), 400
 
-        # Validate required fields
-        item_id = data.get('item_id')
-        user_ldap = data.get('user_ldap')
-        user_id = data.get('user_id')
-        quantity = data.get('quantity', 1)
-
-        if not item_id:
-            return jsonify({'error': 'item_id is required'}), 400
-
-        if not user_ldap and not user_id:
-            return jsonify({'error': 'Either user_ldap or user_id is required'}), 400
+        checkout = _parse_checkout_request(data)
 
         # Get user ID from LDAP if provided
-        if user_ldap and not user_id:
+        user_id = checkout.pop('user_id')
+        user_ldap = checkout.pop('user_ldap')
+        if not user_id:
             user = User.get_by_ldap(user_ldap)
             if not user:
                 return jsonify({'error': f'User with LDAP {user_ldap} not found'}), 404
             user_id = user['user_id']
 
-        # Optional fields
-        expected_return = data.get('expected_return_datetime')
-        if expected_return:
-            expected_return = datetime.fromisoformat(expected_return.replace('Z', '+00:00'))
-
-        checkout_condition = data.get('checkout_condition', 'good')
-        notes = data.get('notes')
-
         # Perform checkout
-        checkout_record = Checkout.checkout_item(
-            item_id=item_id,
-            user_id=user_id,
-            quantity=quantity,
-            expected_return_datetime=expected_return,
-            checkout_condition=checkout_condition,
-            notes=notes
-        )
+        checkout_record = Checkout.checkout_item(user_id=user_id, **checkout)
 
         return jsonify({
             'success': True,
             'message': 'Item checked out successfully',
-            'checkout': {
-                'checkout_id': checkout_record['checkout_id'],
-                'item_id': checkout_record['item_id'],
-                'user_id': checkout_record['user_id'],
-                'quantity': checkout_record['quantity'],
-                'checkout_date': checkout_record['checkout_date'].isoformat(),
-                'expected_return_datetime': checkout_record['expected_return_datetime'].isoformat(),
-                'checkout_condition': checkout_record['checkout_condition'],
-                'notes': checkout_record['notes']
-            }
+            'checkout': _serialize_checkout(checkout_record)
         }), 201
 
     except ValueError as e:
@@ -96,6 +218,71 @@ def checkout_item():
         return jsonify({'error': f'Checkout failed: {str(e)}'}), 500
 
 
+@checkout_bp.route('/bulk', methods=['POST'])
+def checkout_items():
+    """
+    Check out several items in one transaction
+
+    All LDAP usernames are resolved with a single query. If any checkout
+    fails, none of them are applied.
+
+    Request Body (JSON):
+        {
+            "checkouts": [
+                {"item_id": 1, "user_ldap": "jhuang", "quantity": 2},
+                {"item_id": 5, "user_id": 3, "notes": "Kiosk batch"}
+            ]
+        }
+        Each entry accepts the same fields as POST /api/checkout.
+
+    Returns:
+        JSON response with all checkout details
+
+    Example:
+        POST /api/checkout/bulk
+    """
+    try:
+        data = _json_body()
+
+        if not isinstance(data, dict) or not data.get('checkouts'):
+            return jsonify({'error': 'No checkouts provided'}), 400
+        if not isinstance(data['checkouts'], list):
+            return jsonify({'error': 'checkouts must be a list'}), 400
+
+        checkouts = []
+        for index, entry in enumerate(data['checkouts']):
+            try:
+                checkouts.append(_parse_checkout_request(entry))
+            except ValueError as e:
+                return jsonify({'error': f'checkouts[{index}]: {e}'}), 400
+
+        # Resolve every LDAP username in one query
+        ldaps = {c['user_ldap'] for c in checkouts if not c['user_id']}
+        users = User.get_by_ldaps(ldaps) if ldaps else {}
+
+        for checkout in checkouts:
+            user_ldap = checkout.pop('user_ldap')
+            if not checkout['user_id']:
+                user = users.get(user_ldap)
+                if not user:
+                    return jsonify({'error': f"User with LDAP {user_ldap} not found"}), 404
+                checkout['user_id'] = user['user_id']
+
+        checkout_records = Checkout.checkout_items(checkouts)
+
+        return jsonify({
+            'success': True,
+            'message': f'{len(checkout_records)} items checked out successfully',
+            'total_checkouts': len(checkout_records),
+            'checkouts': [_serialize_checkout(r) for r in checkout_records]
+        }), 201
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Bulk checkout failed: {str(e)}'}), 500
+
+
 @checkout_bp.route('/checkin', methods=['POST'])
 def checkin_item():
     """
@@ -115,14 +302,16 @@ def checkin_item():
         POST /api/checkout/checkin
     """
     try:
-        data = request.get_json()
+        data = _json_body()
 
         if not data:
             return jsonify({'error': 'No data provided'}), 400
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Check-in must be a JSON object'}), 400
 
-        checkout_id = data.get('checkout_id')
-        if not checkout_id:
+        if not data.get('checkout_id'):
             return jsonify({'error': 'checkout_id is required'}), 400
+        checkout_id = _positive_int(data, 'checkout_id')
 
         return_condition = data.get('return_condition', 'good')
         return_notes = data.get('return_notes')
@@ -163,41 +352,26 @@ def get_active_checkouts():
     Get all active checkouts
 
     Query Parameters:
-        user_id (int, optional): Filter by user
-        item_id (int, optional): Filter by item
+        user_id (int, optional): Filter by user, may be repeated
+        item_id (int, optional): Filter by item, may be repeated
 
     Returns:
         JSON response with active checkouts
 
     Example:
-        GET /api/checkout/active?user_id=1
+        GET /api/checkout/active?user_id=1&user_id=2
     """
     try:
-        user_id = request.args.get('user_id', type=int)
-        item_id = request.args.get('item_id', type=int)
+        # An absent parameter means no filter, not an empty one
+        user_ids = request.args.getlist('user_id', type=int) or None
+        item_ids = request.args.getlist('item_id', type=int) or None
 
-        checkouts = Checkout.get_active_checkouts(user_id=user_id, item_id=item_id)
+        # Postgres encodes the rows; splice its JSON array into the envelope
+        total, checkouts_json = Checkout.get_active_checkouts_json(user_ids=user_ids,
+                                                                   item_ids=item_ids)
+        body = f'{{"success":true,"total_active_checkouts":{total},"checkouts":{checkouts_json}}}'
 
-        return jsonify({
-            'success': True,
-            'total_active_checkouts': len(checkouts),
-            'checkouts': [{
-                'checkout_id': c['checkout_id'],
-                'checkout_date': c['checkout_date'].isoformat(),
-                'expected_return_datetime': c['expected_return_datetime'].isoformat() if c['expected_return_datetime'] else None,
-                'quantity': c['quantity'],
-                'ldap': c['ldap'],
-                'full_name': c['full_name'],
-                'email': c['email'],
-                'item_id': c['item_id'],
-                'item_name': c['item_name'],
-                'category': c['category'],
-                'location': c['location'],
-                'is_overdue': c['is_overdue'],
-                'days_overdue': c['days_overdue'],
-                'notes': c['notes']
-            } for c in checkouts]
-        }), 200
+        return Response(body, 200, mimetype='application/json')
 
     except Exception as e:
         return jsonify({'error': f'Failed to get active checkouts: {str(e)}'}), 500
@@ -220,19 +394,7 @@ def get_overdue_checkouts():
         return jsonify({
             'success': True,
             'total_overdue': len(checkouts),
-            'checkouts': [{
-                'checkout_id': c['checkout_id'],
-                'checkout_date': c['checkout_date'].isoformat(),
-                'expected_return_datetime': c['expected_return_datetime'].isoformat() if c['expected_return_datetime'] else None,
-                'days_overdue': c['days_overdue'],
-                'quantity': c['quantity'],
-                'ldap': c['ldap'],
-                'full_name': c['full_name'],
-                'email': c['email'],
-                'item_id': c['item_id'],
-                'item_name': c['item_name'],
-                'location': c['location']
-            } for c in checkouts]
+            'checkouts': checkouts
         }), 200
 
     except Exception as e:
@@ -248,47 +410,31 @@ def get_user_checkouts(ldap):
         ldap (str): User LDAP username
 
     Query Parameters:
-        limit (int, optional): Max results (default: 50)
+        limit (int, optional): Max results (default: 50, capped at 1000)
+        before_id (int, optional): Return records older than this history_id;
+            pass the previous page's next_cursor
 
     Returns:
         JSON response with user's checkout history
 
     Example:
-        GET /api/checkout/user/jhuang?limit=20
+        GET /api/checkout/user/jhuang?limit=20&before_id=1234
     """
     try:
-        # Get user
-        user = User.get_by_ldap(ldap)
-        if not user:
+        limit = _history_limit()
+        before_id = request.args.get('before_id', type=int)
+
+        # The user and their history come back from one query
+        rows = iter(Checkout.get_user_checkout_history_by_ldap(ldap, limit=limit,
+                                                              before_id=before_id, stream=True))
+        first = next(rows, None)
+        if first is None:
             return jsonify({'error': f'User {ldap} not found'}), 404
 
-        limit = request.args.get('limit', default=50, type=int)
+        user = {'ldap': first['user_ldap'], 'full_name': first['user_full_name']}
+        history = chain((first,), rows) if first['history_id'] is not None else ()
 
-        history = Checkout.get_user_checkout_history(user['user_id'], limit=limit)
-
-        return jsonify({
-            'success': True,
-            'user': {
-                'ldap': user['ldap'],
-                'full_name': user['full_name']
-            },
-            'total_records': len(history),
-            'history': [{
-                'history_id': h['history_id'],
-                'checkout_date': h['checkout_date'].isoformat(),
-                'return_date': h['return_date'].isoformat() if h['return_date'] else None,
-                'expected_return_datetime': h['expected_return_datetime'].isoformat() if h['expected_return_datetime'] else None,
-                'quantity': h['quantity'],
-                'is_returned': h['is_returned'],
-                'late_return': h['late_return'],
-                'item_id': h['item_id'],
-                'item_name': h['item_name'],
-                'category': h['category'],
-                'location': h['location'],
-                'checkout_condition': h['checkout_condition'],
-                'return_condition': h['return_condition']
-            } for h in history]
-        }), 200
+        return _stream_history({'success': True, 'user': user}, _without_user(history), limit)
 
     except Exception as e:
         return jsonify({'error': f'Failed to get user checkout history: {str(e)}'}), 500
@@ -303,39 +449,24 @@ def get_item_history(item_id):
         item_id (int): Item ID
 
     Query Parameters:
-        limit (int, optional): Max results (default: 50)
+        limit (int, optional): Max results (default: 50, capped at 1000)
+        before_id (int, optional): Return records older than this history_id;
+            pass the previous page's next_cursor
 
     Returns:
         JSON response with item's checkout history
 
     Example:
-        GET /api/checkout/item/1/history?limit=20
+        GET /api/checkout/item/1/history?limit=20&before_id=1234
     """
     try:
-        limit = request.args.get('limit', default=50, type=int)
+        limit = _history_limit()
+        before_id = request.args.get('before_id', type=int)
 
-        history = Checkout.get_item_checkout_history(item_id, limit=limit)
+        history = Checkout.get_item_checkout_history(item_id, limit=limit, before_id=before_id,
+                                                     stream=True)
 
-        return jsonify({
-            'success': True,
-            'item_id': item_id,
-            'total_records': len(history),
-            'history': [{
-                'history_id': h['history_id'],
-                'checkout_date': h['checkout_date'].isoformat(),
-                'return_date': h['return_date'].isoformat() if h['return_date'] else None,
-                'expected_return_datetime': h['expected_return_datetime'].isoformat() if h['expected_return_datetime'] else None,
-                'quantity': h['quantity'],
-                'is_returned': h['is_returned'],
-                'late_return': h['late_return'],
-                'ldap': h['ldap'],
-                'full_name': h['full_name'],
-                'checkout_condition': h['checkout_condition'],
-                'return_condition': h['return_condition'],
-                'checkout_notes': h['checkout_notes'],
-                'return_notes': h['return_notes']
-            } for h in history]
-        }), 200
+        return _stream_history({'success': True, 'item_id': item_id}, history, limit)
 
     except Exception as e:
         return jsonify({'error': f'Failed to get item checkout history: {str(e)}'}), 500
\ No newline at end of file
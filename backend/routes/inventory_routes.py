@@ -5,9 +5,10 @@ Home page endpoint - displays current inventory for specific location
 
 
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request
+import hashlib
+import json
 import os
-import sys
 
 
 from models.item import Item
@@ -16,6 +17,39 @@ from models.user import User
 
 home_bp = Blueprint('home_bp', __name__, url_prefix='/api/inventory')
 
+# Allowed locations from the comma-separated LOCATIONS env var, parsed once;
+# empty means any location is accepted
+_VALID_LOCATIONS = frozenset(
+    filter(None, (loc.strip() for loc in os.environ.get('LOCATIONS', '').split(',')))
+)
+
+
+def _invalid_location_body(valid_locations):
+    """Encode the 'Invalid location' error body for a set of valid locations"""
+    return json.dumps({
+        'error': 'Invalid location',
+        'valid_locations': ','.join(sorted(valid_locations))
+    }).encode()
+
+
+# Static error bodies, encoded once at import
+_MISSING_LOCATION_BODY = json.dumps({'error': 'Missing required parameter: location'}).encode()
+_INVALID_LOCATION_BODY = _invalid_location_body(_VALID_LOCATIONS)
+
+
+def _etag(*parts):
+    """Build an opaque ETag value from the values a response depends on"""
+    return hashlib.blake2b('|'.join(map(str, parts)).encode(), digest_size=12).hexdigest()
+
+
+def _not_modified(etag):
+    """Return a 304 response if the client's cached copy matches `etag`, else None"""
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+    return None
+
 
 @home_bp.route('', methods=['GET'])
 def get_inventory():
@@ -27,7 +61,8 @@ def get_inventory():
         ldap (str, optional): User LDAP for authentication
 
     Returns:
-        JSON response with items and availability
+        JSON response with items and availability, carrying a weak ETag;
+        304 Not Modified when If-None-Match matches it
 
     Example:
         GET /api/inventory?location=san_jose&ldap=jhuang
@@ -39,17 +74,11 @@ def get_inventory():
 
     # Validate required parameters
     if not location:
-        return jsonify({
-            'error': 'Missing required parameter: location'
-        }), 400
+        return Response(_MISSING_LOCATION_BODY, 400, mimetype='application/json')
 
     # Optional: Validate location against allowed locations
-    locations_str = os.environ.get('LOCATIONS', '')
-    if locations_str and location not in locations_str:
-        return jsonify({
-            'error': 'Invalid location',
-            'valid_locations': locations_str
-        }), 400
+    if _VALID_LOCATIONS and location not in _VALID_LOCATIONS:
+        return Response(_INVALID_LOCATION_BODY, 400, mimetype='application/json')
 
     # Optional: Validate and get user info
     user = None
@@ -61,42 +90,29 @@ def get_inventory():
             }), 401
 
     try:
+        # Answer repeat polls from the location's fingerprint alone
+        version = Item.get_location_version(location)
+        etag = _etag(location, version['last_updated'], version['item_count'],
+                     user['user_id'] if user else None)
+        not_modified = _not_modified(etag)
+        if not_modified:
+            return not_modified
+
         # Query inventory from database
         items = Item.get_by_location(location)
 
-        # Format response
-        response_items = []
-        for item in items:
-            response_items.append({
-                'item_id': item['item_id'],
-                'item_name': item['item_name'],
-                'category': item['category'],
-                'location': item['location'],
-                'quantity_total': item['quantity_total'],
-                'quantity_available': item['quantity_available'],
-                'quantity_checked_out': item['quantity_checked_out'],
-                'purchase_price': float(item['purchase_price']) if item['purchase_price'] else None,
-                'condition': item['condition'],
-                'status': item['status'],
-                'notes': item['notes'],
-                'image_url': item['image_url'],
-                'availability_status': (
-                    'Out of Stock' if item['quantity_available'] == 0
-                    else 'Low Stock' if item['quantity_available'] < (item['quantity_total'] * 0.2)
-                    else 'Available'
-                )
-            })
-
-        return jsonify({
+        response = jsonify({
             'success': True,
             'location': location,
             'user': {
                 'ldap': user['ldap'],
                 'full_name': user['full_name']
             } if user else None,
-            'total_items': len(response_items),
-            'items': response_items
-        }), 200
+            'total_items': len(items),
+            'items': items
+        })
+        response.set_etag(etag, weak=True)
+        return response, 200
 
     except Exception as e:
         return jsonify({
@@ -131,22 +147,12 @@ def search_inventory():
     try:
         items = Item.search(query_text, location)
 
-        response_items = [{
-            'item_id': item['item_id'],
-            'item_name': item['item_name'],
-            'category': item['category'],
-            'location': item['location'],
-            'quantity_available': item['quantity_available'],
-            'condition': item['condition'],
-            'status': item['status']
-        } for item in items]
-
         return jsonify({
             'success': True,
             'query': query_text,
             'location': location,
-            'total_results': len(response_items),
-            'items': response_items
+            'total_results': len(items),
+            'items': items
         }), 200
 
     except Exception as e:
@@ -165,14 +171,13 @@ def get_item_details(item_id):
         item_id (int): Item ID
 
     Returns:
-        JSON response with item details
+        JSON response with item details, carrying a weak ETag;
+        304 Not Modified when If-None-Match matches it
 
     Example:
         GET /api/inventory/42
     '''
     try:
-
-
         item = Item.get_by_id(item_id)
 
         if not item:
@@ -180,7 +185,12 @@ def get_item_details(item_id):
                 'error': 'Item not found'
             }), 404
 
-        return jsonify({
+        etag = _etag(item['item_id'], item['updated_at'])
+        not_modified = _not_modified(etag)
+        if not_modified:
+            return not_modified
+
+        response = jsonify({
             'success': True,
             'item': {
                 'item_id': item['item_id'],
@@ -198,7 +208,9 @@ def get_item_details(item_id):
                 'notes': item['notes'],
                 'image_url': item['image_url']
             }
-        }), 200
+        })
+        response.set_etag(etag, weak=True)
+        return response, 200
 
     except Exception as e:
         return jsonify({
@@ -1,3 +0,0 @@
-"""
-Unit tests package for inventory management backend
-"""
\ No newline at end of file
@@ -4,8 +4,43 @@ Unit tests for Flask app and routes
 
 import pytest
 import json
-from unittest.mock import patch
-from datetime import datetime, timedelta
+from unittest.mock import Mock
+from datetime import datetime, timedelta, timezone
+
+from models.checkout import Checkout
+from models.item import Item
+from models.user import User
+from routes import inventory_routes
+
+# Mock-only tests, selectable with -m unit
+pytestmark = pytest.mark.unit
+
+# Fixed point in time for record timestamps, so records need not call datetime.now()
+NOW = datetime(2024, 1, 1, 9, 0, 0)
+WEEK_AGO = NOW - timedelta(days=7)
+IN_A_WEEK = NOW + timedelta(days=7)
+
+# History columns of a checkout returned three weeks ago
+_RETURNED = {
+    'history_id': 1,
+    'checkout_date': NOW - timedelta(days=30),
+    'return_date': NOW - timedelta(days=23),
+    'expected_return_datetime': NOW - timedelta(days=23),
+    'is_returned': True,
+    'late_return': False,
+    'checkout_condition': 'good',
+    'return_condition': 'good'
+}
+
+
+def _insufficient_quantity(*args, **kwargs):
+    """Stand-in for Checkout.checkout_item when stock runs out"""
+    raise ValueError('Insufficient quantity')
+
+
+def _checkout_not_found(*args, **kwargs):
+    """Stand-in for Checkout.checkin_item with an unknown checkout"""
+    raise ValueError('Checkout 999 not found')
 
 
 class TestAppBasics:
@@ -21,9 +56,8 @@ class TestAppBasics:
         response = client.get('/')
 
         assert response.status_code == 200
-        data = json.loads(response.data)
-        assert data['name'] == 'Inventory Management API'
-        assert data['version'] == '1.0.0'
+        data = response.get_json()
+        assert {'name': 'Inventory Management API', 'version': '1.0.0'}.items() <= data.items()
         assert 'endpoints' in data
 
     def test_health_check(self, client):
@@ -31,433 +65,705 @@ class TestAppBasics:
         response = client.get('/health')
 
         assert response.status_code == 200
-        data = json.loads(response.data)
-        assert data['status'] == 'healthy'
-        assert data['database'] == 'connected'
-
-
-class TestInventoryRoutes:
-    """Test inventory routes"""
-
-    def test_get_inventory_success(self, client, sample_item):
-        """Test getting inventory for a location"""
-        with patch('models.item.Item.get_by_location', return_value=[sample_item]):
-            response = client.get('/api/inventory?location=san_jose')
-
-            assert response.status_code == 200
-            data = json.loads(response.data)
-            assert data['success'] is True
-            assert data['location'] == 'san_jose'
-            assert data['total_items'] == 1
-            assert len(data['items']) == 1
-            assert data['items'][0]['item_name'] == 'Test Drill'
-
-    def test_get_inventory_with_user(self, client, sample_item, sample_user):
-        """Test getting inventory with user LDAP"""
-        with patch('models.item.Item.get_by_location', return_value=[sample_item]):
-            with patch('models.user.User.get_by_ldap', return_value=sample_user):
-                response = client.get('/api/inventory?location=san_jose&ldap=jdoe')
-
-                assert response.status_code == 200
-                data = json.loads(response.data)
-                assert data['success'] is True
-                assert data['user'] is not None
-                assert data['user']['ldap'] == 'jdoe'
-                assert data['user']['full_name'] == 'John Doe'
-
-    def test_get_inventory_missing_location(self, client):
-        """Test getting inventory without location parameter"""
-        response = client.get('/api/inventory')
-
-        assert response.status_code == 400
-        data = json.loads(response.data)
-        assert 'error' in data
-        assert 'location' in data['error']
-
-    def test_get_inventory_invalid_user(self, client):
-        """Test getting inventory with invalid LDAP"""
-        with patch('models.user.User.get_by_ldap', return_value=None):
-            response = client.get('/api/inventory?location=san_jose&ldap=invalid')
-
-            assert response.status_code == 401
-            data = json.loads(response.data)
-            assert 'error' in data
-            assert 'LDAP' in data['error']
-
-    def test_get_inventory_availability_status(self, client, sample_item):
-        """Test availability status calculation"""
-        # Test Out of Stock
-        out_of_stock_item = sample_item.copy()
-        out_of_stock_item['quantity_available'] = 0
-
-        with patch('models.item.Item.get_by_location', return_value=[out_of_stock_item]):
-            response = client.get('/api/inventory?location=san_jose')
-            data = json.loads(response.data)
-            assert data['items'][0]['availability_status'] == 'Out of Stock'
-
-        # Test Low Stock
-        low_stock_item = sample_item.copy()
-        low_stock_item['quantity_available'] = 1
-        low_stock_item['quantity_total'] = 10
-
-        with patch('models.item.Item.get_by_location', return_value=[low_stock_item]):
-            response = client.get('/api/inventory?location=san_jose')
-            data = json.loads(response.data)
-            assert data['items'][0]['availability_status'] == 'Low Stock'
-
-        # Test Available
-        available_item = sample_item.copy()
-        available_item['quantity_available'] = 8
-        available_item['quantity_total'] = 10
-
-        with patch('models.item.Item.get_by_location', return_value=[available_item]):
-            response = client.get('/api/inventory?location=san_jose')
-            data = json.loads(response.data)
-            assert data['items'][0]['availability_status'] == 'Available'
-
-    def test_search_inventory_success(self, client, sample_item):
-        """Test searching inventory"""
-        with patch('models.item.Item.search', return_value=[sample_item]):
-            response = client.get('/api/inventory/search?q=drill')
-
-            assert response.status_code == 200
-            data = json.loads(response.data)
-            assert data['success'] is True
-            assert data['query'] == 'drill'
-            assert data['total_results'] == 1
-            assert len(data['items']) == 1
-
-    def test_search_inventory_with_location(self, client, sample_item):
-        """Test searching inventory with location filter"""
-        with patch('models.item.Item.search', return_value=[sample_item]):
-            response = client.get('/api/inventory/search?q=drill&location=san_jose')
-
-            assert response.status_code == 200
-            data = json.loads(response.data)
-            assert data['location'] == 'san_jose'
-
-    def test_search_inventory_missing_query(self, client):
-        """Test searching without query parameter"""
-        response = client.get('/api/inventory/search')
-
-        assert response.status_code == 400
-        data = json.loads(response.data)
-        assert 'error' in data
-
-    def test_get_item_details_success(self, client, sample_item):
-        """Test getting item details by ID"""
-        with patch('models.item.Item.get_by_id', return_value=sample_item):
-            response = client.get('/api/inventory/1')
-
-            assert response.status_code == 200
-            data = json.loads(response.data)
-            assert data['success'] is True
-            assert data['item']['item_id'] == 1
-            assert data['item']['item_name'] == 'Test Drill'
-
-    def test_get_item_details_not_found(self, client):
-        """Test getting non-existent item"""
-        with patch('models.item.Item.get_by_id', return_value=None):
-            response = client.get('/api/inventory/999')
-
-            assert response.status_code == 404
-            data = json.loads(response.data)
-            assert 'error' in data
-            assert 'not found' in data['error']
-
-
-class TestCheckoutRoutes:
-    """Test checkout routes"""
-
-    def test_checkout_item_success_with_ldap(self, client, sample_user, sample_checkout):
-        """Test successful checkout with user LDAP"""
-        checkout_record = sample_checkout.copy()
-        checkout_record['checkout_date'] = datetime.now()
-        checkout_record['expected_return_datetime'] = datetime.now() + timedelta(days=7)
-
-        with patch('models.user.User.get_by_ldap', return_value=sample_user):
-            with patch('models.checkout.Checkout.checkout_item', return_value=checkout_record):
-                response = client.post('/api/checkout', json={
-                    'item_id': 1,
-                    'user_ldap': 'jdoe',
-                    'quantity': 2,
-                    'notes': 'Test checkout'
-                })
-
-                assert response.status_code == 201
-                data = json.loads(response.data)
-                assert data['success'] is True
-                assert data['message'] == 'Item checked out successfully'
-                assert data['checkout']['checkout_id'] == 1
-
-    def test_checkout_item_success_with_user_id(self, client, sample_checkout):
-        """Test successful checkout with user ID"""
-        checkout_record = sample_checkout.copy()
-        checkout_record['checkout_date'] = datetime.now()
-        checkout_record['expected_return_datetime'] = datetime.now() + timedelta(days=7)
-
-        with patch('models.checkout.Checkout.checkout_item', return_value=checkout_record):
-            response = client.post('/api/checkout', json={
-                'item_id': 1,
-                'user_id': 1,
-                'quantity': 2
-            })
-
-            assert response.status_code == 201
-            data = json.loads(response.data)
-            assert data['success'] is True
-
-    def test_checkout_item_missing_item_id(self, client):
-        """Test checkout without item_id"""
-        response = client.post('/api/checkout', json={
-            'user_ldap': 'jdoe',
-            'quantity': 1
+        data = response.get_json()
+        assert {'status': 'healthy', 'database': 'connected'}.items() <= data.items()
+
+    def test_cors_preflight(self, client, monkeypatch):
+        """Test preflight requests are answered before route dispatch"""
+        mock_get = Mock()
+        monkeypatch.setattr(Item, 'get_by_location', mock_get)
+        response = client.options('/api/inventory', headers={
+            'Origin': 'http://localhost:3000',
+            'Access-Control-Request-Method': 'GET'
         })
 
-        assert response.status_code == 400
-        data = json.loads(response.data)
-        assert 'error' in data
-        assert 'item_id' in data['error']
-
-    def test_checkout_item_missing_user(self, client):
-        """Test checkout without user identifier"""
-        response = client.post('/api/checkout', json={
-            'item_id': 1,
-            'quantity': 1
+        assert response.status_code == 204
+        assert response.headers['Access-Control-Allow-Origin'] == 'http://localhost:3000'
+        assert 'GET' in response.headers['Access-Control-Allow-Methods']
+        assert response.headers['Access-Control-Allow-Credentials'] == 'true'
+        mock_get.assert_not_called()
+
+    def test_cors_preflight_unknown_origin(self, client):
+        """Test preflight from an unlisted origin gets no CORS grant"""
+        response = client.options('/api/inventory', headers={
+            'Origin': 'http://evil.example.com',
+            'Access-Control-Request-Method': 'GET'
         })
 
-        assert response.status_code == 400
-        data = json.loads(response.data)
-        assert 'error' in data
-        assert 'user' in data['error'].lower()
-
-    def test_checkout_item_user_not_found(self, client):
-        """Test checkout with non-existent user"""
-        with patch('models.user.User.get_by_ldap', return_value=None):
-            response = client.post('/api/checkout', json={
-                'item_id': 1,
-                'user_ldap': 'nonexistent',
-                'quantity': 1
-            })
-
-            assert response.status_code == 404
-            data = json.loads(response.data)
-            assert 'error' in data
-
-    def test_checkout_item_insufficient_quantity(self, client, sample_user):
-        """Test checkout with insufficient quantity"""
-        with patch('models.user.User.get_by_ldap', return_value=sample_user):
-            with patch('models.checkout.Checkout.checkout_item',
-                      side_effect=ValueError("Insufficient quantity")):
-                response = client.post('/api/checkout', json={
-                    'item_id': 1,
-                    'user_ldap': 'jdoe',
-                    'quantity': 100
-                })
-
-                assert response.status_code == 400
-                data = json.loads(response.data)
-                assert 'error' in data
-
-    def test_checkin_item_success(self, client, sample_checkout_history):
-        """Test successful check-in"""
-        history_record = sample_checkout_history.copy()
-        history_record['checkout_date'] = datetime.now() - timedelta(days=7)
-        history_record['return_date'] = datetime.now()
-
-        with patch('models.checkout.Checkout.checkin_item', return_value=history_record):
-            response = client.post('/api/checkout/checkin', json={
-                'checkout_id': 1,
-                'return_condition': 'good',
-                'return_notes': 'Returned on time'
-            })
-
-            assert response.status_code == 200
-            data = json.loads(response.data)
-            assert data['success'] is True
-            assert data['message'] == 'Item checked in successfully'
-            assert data['history']['is_returned'] is True
-
-    def test_checkin_item_missing_checkout_id(self, client):
-        """Test check-in without checkout_id"""
-        response = client.post('/api/checkout/checkin', json={
-            'return_condition': 'good'
+        assert response.status_code == 204
+        assert 'Access-Control-Allow-Origin' not in response.headers
+
+    def test_cors_preflight_unknown_route(self, client):
+        """Test a preflight for a URL with no route still gets a 404"""
+        response = client.options('/no/such/route', headers={
+            'Origin': 'http://localhost:3000',
+            'Access-Control-Request-Method': 'GET'
         })
 
-        assert response.status_code == 400
-        data = json.loads(response.data)
-        assert 'error' in data
-        assert 'checkout_id' in data['error']
-
-    def test_checkin_item_not_found(self, client):
-        """Test check-in of non-existent checkout"""
-        with patch('models.checkout.Checkout.checkin_item',
-                  side_effect=ValueError("Checkout 999 not found")):
-            response = client.post('/api/checkout/checkin', json={
-                'checkout_id': 999
-            })
-
-            assert response.status_code == 400
-            data = json.loads(response.data)
-            assert 'error' in data
-
-    def test_get_active_checkouts(self, client):
-        """Test getting all active checkouts"""
-        checkouts = [{
-            'checkout_id': 1,
-            'checkout_date': datetime.now(),
-            'expected_return_datetime': datetime.now() + timedelta(days=7),
-            'quantity': 2,
-            'ldap': 'jdoe',
-            'full_name': 'John Doe',
-            'email': 'jdoe@company.com',
-            'item_id': 1,
-            'item_name': 'Test Drill',
-            'category': 'tools',
-            'location': 'san_jose',
-            'is_overdue': False,
-            'days_overdue': 0,
-            'notes': 'Test'
-        }]
-
-        with patch('models.checkout.Checkout.get_active_checkouts', return_value=checkouts):
-            response = client.get('/api/checkout/active')
-
-            assert response.status_code == 200
-            data = json.loads(response.data)
-            assert data['success'] is True
-            assert data['total_active_checkouts'] == 1
-            assert len(data['checkouts']) == 1
-
-    def test_get_active_checkouts_filtered_by_user(self, client):
-        """Test getting active checkouts filtered by user"""
-        with patch('models.checkout.Checkout.get_active_checkouts', return_value=[]):
-            response = client.get('/api/checkout/active?user_id=1')
-
-            assert response.status_code == 200
-            data = json.loads(response.data)
-            assert data['success'] is True
-
-    def test_get_overdue_checkouts(self, client):
-        """Test getting overdue checkouts"""
-        checkouts = [{
-            'checkout_id': 1,
-            'checkout_date': datetime.now() - timedelta(days=10),
-            'expected_return_datetime': datetime.now() - timedelta(days=2),
-            'days_overdue': 2,
-            'quantity': 2,
-            'ldap': 'jdoe',
-            'full_name': 'John Doe',
-            'email': 'jdoe@company.com',
-            'item_id': 1,
-            'item_name': 'Test Drill',
-            'location': 'san_jose'
-        }]
-
-        with patch('models.checkout.Checkout.get_overdue_checkouts', return_value=checkouts):
-            response = client.get('/api/checkout/overdue')
-
-            assert response.status_code == 200
-            data = json.loads(response.data)
-            assert data['success'] is True
-            assert data['total_overdue'] == 1
-            assert len(data['checkouts']) == 1
-
-    def test_get_user_checkouts(self, client, sample_user):
-        """Test getting user checkout history"""
-        history = [{
-            'history_id': 1,
-            'checkout_date': datetime.now() - timedelta(days=30),
-            'return_date': datetime.now() - timedelta(days=23),
-            'expected_return_datetime': datetime.now() - timedelta(days=23),
-            'quantity': 2,
-            'is_returned': True,
-            'late_return': False,
-            'item_id': 1,
-            'item_name': 'Test Drill',
-            'category': 'tools',
-            'location': 'san_jose',
-            'checkout_condition': 'good',
-            'return_condition': 'good'
-        }]
-
-        with patch('models.user.User.get_by_ldap', return_value=sample_user):
-            with patch('models.checkout.Checkout.get_user_checkout_history', return_value=history):
-                response = client.get('/api/checkout/user/jdoe')
-
-                assert response.status_code == 200
-                data = json.loads(response.data)
-                assert data['success'] is True
-                assert data['user']['ldap'] == 'jdoe'
-                assert data['total_records'] == 1
-
-    def test_get_user_checkouts_not_found(self, client):
-        """Test getting history for non-existent user"""
-        with patch('models.user.User.get_by_ldap', return_value=None):
-            response = client.get('/api/checkout/user/nonexistent')
-
-            assert response.status_code == 404
-            data = json.loads(response.data)
-            assert 'error' in data
-
-    def test_get_user_checkouts_custom_limit(self, client, sample_user):
-        """Test getting user history with custom limit"""
-        with patch('models.user.User.get_by_ldap', return_value=sample_user):
-            with patch('models.checkout.Checkout.get_user_checkout_history', return_value=[]):
-                response = client.get('/api/checkout/user/jdoe?limit=10')
-
-                assert response.status_code == 200
-                data = json.loads(response.data)
-                assert data['success'] is True
-
-    def test_get_item_history(self, client):
-        """Test getting item checkout history"""
-        history = [{
-            'history_id': 1,
-            'checkout_date': datetime.now() - timedelta(days=30),
-            'return_date': datetime.now() - timedelta(days=23),
-            'expected_return_datetime': datetime.now() - timedelta(days=23),
-            'quantity': 2,
-            'is_returned': True,
-            'late_return': False,
-            'ldap': 'jdoe',
-            'full_name': 'John Doe',
-            'checkout_condition': 'good',
-            'return_condition': 'good',
-            'checkout_notes': 'Test',
-            'return_notes': 'Returned'
-        }]
-
-        with patch('models.checkout.Checkout.get_item_checkout_history', return_value=history):
-            response = client.get('/api/checkout/item/1/history')
-
-            assert response.status_code == 200
-            data = json.loads(response.data)
-            assert data['success'] is True
-            assert data['item_id'] == 1
-            assert data['total_records'] == 1
-
-    def test_get_item_history_custom_limit(self, client):
-        """Test getting item history with custom limit"""
-        with patch('models.checkout.Checkout.get_item_checkout_history', return_value=[]):
-            response = client.get('/api/checkout/item/1/history?limit=25')
-
-            assert response.status_code == 200
-            data = json.loads(response.data)
-            assert data['success'] is True
-
-    def test_checkout_no_data(self, client):
-        """Test checkout endpoint with no JSON data"""
-        response = client.post('/api/checkout', data='null', content_type='application/json')
-
-        assert response.status_code == 400
-        data = json.loads(response.data)
-        assert 'error' in data
-
-    def test_checkin_no_data(self, client):
-        """Test check-in endpoint with no JSON data"""
-        response = client.post('/api/checkout/checkin', data='null', content_type='application/json')
-
-        assert response.status_code == 400
-        data = json.loads(response.data)
-        assert 'error' in data
\ No newline at end of file
+        assert response.status_code == 404
+
+    def test_plain_options_dispatched(self, client):
+        """Test an OPTIONS request that is not a preflight gets Flask's Allow header"""
+        response = client.options('/api/inventory')
+
+        assert response.status_code == 200
+        assert 'GET' in response.headers['Allow']
+
+
+# Inventory routes
+
+@pytest.fixture(scope='module')
+def sample_item_json(app, sample_item):
+    """sample_item as it reads back from a response, decoded once per module"""
+    return app.json.loads(app.json.dumps(dict(sample_item)))
+
+
+@pytest.fixture
+def location_version(monkeypatch):
+    """Fingerprint returned for every location"""
+    version = {'last_updated': datetime(2024, 1, 1, 0, 0, 0), 'item_count': 1}
+    mock_version = Mock(return_value=version)
+    monkeypatch.setattr(Item, 'get_location_version', mock_version)
+    return mock_version
+
+
+@pytest.mark.usefixtures('location_version')
+def test_get_inventory_etag(client, sample_item, monkeypatch):
+    """Test a repeat poll with a matching ETag skips the inventory query"""
+    mock_get = Mock(return_value=[dict(sample_item)])
+    monkeypatch.setattr(Item, 'get_by_location', mock_get)
+    first = client.get('/api/inventory', query_string={'location': 'san_jose'})
+    etag = first.headers['ETag']
+
+    second = client.get('/api/inventory', query_string={'location': 'san_jose'},
+                        headers={'If-None-Match': etag})
+
+    assert first.status_code == 200
+    assert etag.startswith('W/"')
+    assert second.status_code == 304
+    assert second.headers['ETag'] == etag
+    assert second.data == b''
+    mock_get.assert_called_once()
+
+
+def test_get_inventory_etag_changes_with_location(client, sample_item, location_version,
+                                                   monkeypatch):
+    """Test the ETag changes when the location's items change"""
+    monkeypatch.setattr(Item, 'get_by_location', lambda *a, **k: [dict(sample_item)])
+    etag = client.get('/api/inventory', query_string={'location': 'san_jose'}).headers['ETag']
+
+    location_version.return_value = {'last_updated': datetime(2024, 1, 2), 'item_count': 1}
+    response = client.get('/api/inventory', query_string={'location': 'san_jose'},
+                          headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_get_item_details_etag(client, sample_item, monkeypatch):
+    """Test item details answer 304 for a matching ETag"""
+    monkeypatch.setattr(Item, 'get_by_id', lambda *a, **k: sample_item)
+    etag = client.get('/api/inventory/1').headers['ETag']
+    response = client.get('/api/inventory/1', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+
+
+@pytest.mark.usefixtures('location_version')
+def test_get_inventory_success(client, sample_item, sample_item_json, monkeypatch):
+    """Test getting inventory for a location"""
+    monkeypatch.setattr(Item, 'get_by_location', lambda *a, **k: [dict(sample_item)])
+    response = client.get('/api/inventory', query_string={'location': 'san_jose'})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert {'success': True, 'location': 'san_jose', 'total_items': 1}.items() <= data.items()
+    assert data['items'] == [sample_item_json]
+
+
+@pytest.mark.usefixtures('location_version')
+def test_get_inventory_with_user(client, sample_item, sample_user, patched_models):
+    """Test getting inventory with user LDAP"""
+    patched_models.item.get_by_location.return_value = [dict(sample_item)]
+    patched_models.user.get_by_ldap.return_value = sample_user
+    response = client.get('/api/inventory', query_string={'location': 'san_jose', 'ldap': 'jdoe'})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['success'] is True
+    assert data['user'] is not None
+    assert data['user']['ldap'] == 'jdoe'
+    assert data['user']['full_name'] == 'John Doe'
+
+
+def test_get_inventory_missing_location(client):
+    """Test getting inventory without location parameter"""
+    response = client.get('/api/inventory')
+
+    assert response.status_code == 400
+    data = response.get_json()
+    assert 'error' in data
+    assert 'location' in data['error']
+
+
+def test_get_inventory_invalid_location(client, monkeypatch):
+    """Test locations are matched exactly, not as substrings"""
+    valid = frozenset({'san_jose', '2u'})
+    monkeypatch.setattr(inventory_routes, '_VALID_LOCATIONS', valid)
+    monkeypatch.setattr(inventory_routes, '_INVALID_LOCATION_BODY',
+                        inventory_routes._invalid_location_body(valid))
+    response = client.get('/api/inventory', query_string={'location': 'san'})
+
+    assert response.status_code == 400
+    data = response.get_json()
+    assert {'error': 'Invalid location', 'valid_locations': '2u,san_jose'}.items() <= data.items()
+
+
+def test_get_inventory_invalid_user(client, monkeypatch):
+    """Test getting inventory with invalid LDAP"""
+    monkeypatch.setattr(User, 'get_by_ldap', lambda *a, **k: None)
+    response = client.get('/api/inventory', query_string={'location': 'san_jose', 'ldap': 'invalid'})
+
+    assert response.status_code == 401
+    data = response.get_json()
+    assert 'error' in data
+    assert 'LDAP' in data['error']
+
+
+@pytest.mark.parametrize('qty_avail, qty_total, expected', [
+    (0, 10, 'Out of Stock'),
+    (1, 10, 'Low Stock'),
+    (8, 10, 'Available'),
+])
+@pytest.mark.usefixtures('location_version')
+def test_get_inventory_availability_status(client, sample_item, monkeypatch,
+                                           qty_avail, qty_total, expected):
+    """Test availability status computed by the query is passed through"""
+    item = {**sample_item, 'quantity_available': qty_avail, 'quantity_total': qty_total,
+            'availability_status': expected}
+
+    monkeypatch.setattr(Item, 'get_by_location', lambda *a, **k: [item])
+    response = client.get('/api/inventory', query_string={'location': 'san_jose'})
+    data = response.get_json()
+    assert data['items'][0]['availability_status'] == expected
+    assert data['items'][0]['quantity_available'] == qty_avail
+
+
+def test_search_inventory_success(client, sample_item, sample_item_json, monkeypatch):
+    """Test searching inventory"""
+    monkeypatch.setattr(Item, 'search', lambda *a, **k: [dict(sample_item)])
+    response = client.get('/api/inventory/search', query_string={'q': 'drill'})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert {'success': True, 'query': 'drill', 'total_results': 1}.items() <= data.items()
+    assert data['items'] == [sample_item_json]
+
+
+def test_search_inventory_with_location(client, sample_item, monkeypatch):
+    """Test searching inventory with location filter"""
+    monkeypatch.setattr(Item, 'search', lambda *a, **k: [dict(sample_item)])
+    response = client.get('/api/inventory/search', query_string={'q': 'drill', 'location': 'san_jose'})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['location'] == 'san_jose'
+
+
+def test_search_inventory_missing_query(client):
+    """Test searching without query parameter"""
+    response = client.get('/api/inventory/search')
+
+    assert response.status_code == 400
+    data = response.get_json()
+    assert 'error' in data
+
+
+def test_get_item_details_success(client, sample_item, monkeypatch):
+    """Test getting item details by ID"""
+    monkeypatch.setattr(Item, 'get_by_id', lambda *a, **k: sample_item)
+    response = client.get('/api/inventory/1')
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['success'] is True
+    assert data['item']['item_id'] == 1
+    assert data['item']['item_name'] == 'Test Drill'
+
+
+def test_get_item_details_not_found(client, monkeypatch):
+    """Test getting non-existent item"""
+    monkeypatch.setattr(Item, 'get_by_id', lambda *a, **k: None)
+    response = client.get('/api/inventory/999')
+
+    assert response.status_code == 404
+    data = response.get_json()
+    assert 'error' in data
+    assert 'not found' in data['error']
+
+
+# Checkout routes
+
+@pytest.fixture(scope='module')
+def active_checkouts(checkout_record_factory):
+    """Rows returned by the patched active checkouts query"""
+    return [checkout_record_factory(is_overdue=False, days_overdue=0)]
+
+
+@pytest.fixture(scope='module')
+def overdue_checkouts(checkout_record_factory):
+    """Rows returned by the patched overdue checkouts query"""
+    return [checkout_record_factory(checkout_date=NOW - timedelta(days=10),
+                                    expected_return_datetime=NOW - timedelta(days=2),
+                                    days_overdue=2)]
+
+
+@pytest.fixture(scope='module')
+def user_history(checkout_record_factory):
+    """Rows returned by the patched user history query, user columns included"""
+    return [checkout_record_factory(**_RETURNED, user_ldap='jdoe', user_full_name='John Doe')]
+
+
+@pytest.fixture(scope='module')
+def item_history(checkout_record_factory):
+    """Rows returned by the patched item history query"""
+    return [checkout_record_factory(**_RETURNED, checkout_notes='Test', return_notes='Returned')]
+
+
+@pytest.fixture(scope='module')
+def checkout_record(sample_checkout):
+    """Checkout row as returned by the model, shared by the module's checkout tests"""
+    return {**sample_checkout, 'checkout_date': NOW,
+            'expected_return_datetime': IN_A_WEEK}
+
+
+def test_checkout_item_success_with_ldap(client, sample_user, checkout_record, patched_models):
+    """Test successful checkout with user LDAP"""
+    patched_models.user.get_by_ldap.return_value = sample_user
+    patched_models.checkout.checkout_item.return_value = checkout_record
+    response = client.post('/api/checkout', json={
+        'item_id': 1,
+        'user_ldap': 'jdoe',
+        'quantity': 2,
+        'notes': 'Test checkout'
+    })
+
+    assert response.status_code == 201
+    data = response.get_json()
+    assert {'success': True, 'message': 'Item checked out successfully'}.items() <= data.items()
+    assert data['checkout']['checkout_id'] == 1
+
+
+def test_checkout_item_success_with_user_id(client, checkout_record, monkeypatch):
+    """Test successful checkout with user ID"""
+    monkeypatch.setattr(Checkout, 'checkout_item', lambda *a, **k: checkout_record)
+    response = client.post('/api/checkout', json={
+        'item_id': 1,
+        'user_id': 1,
+        'quantity': 2
+    })
+
+    assert response.status_code == 201
+    data = response.get_json()
+    assert data['success'] is True
+
+
+def test_checkout_item_missing_item_id(client):
+    """Test checkout without item_id"""
+    response = client.post('/api/checkout', json={
+        'user_ldap': 'jdoe',
+        'quantity': 1
+    })
+
+    assert response.status_code == 400
+    data = response.get_json()
+    assert 'error' in data
+    assert 'item_id' in data['error']
+
+
+def test_checkout_item_missing_user(client):
+    """Test checkout without user identifier"""
+    response = client.post('/api/checkout', json={
+        'item_id': 1,
+        'quantity': 1
+    })
+
+    assert response.status_code == 400
+    data = response.get_json()
+    assert 'error' in data
+    assert 'user' in data['error'].lower()
+
+
+def test_checkout_item_user_not_found(client, monkeypatch):
+    """Test checkout with non-existent user"""
+    monkeypatch.setattr(User, 'get_by_ldap', lambda *a, **k: None)
+    response = client.post('/api/checkout', json={
+        'item_id': 1,
+        'user_ldap': 'nonexistent',
+        'quantity': 1
+    })
+
+    assert response.status_code == 404
+    data = response.get_json()
+    assert 'error' in data
+
+
+def test_checkout_item_insufficient_quantity(client, sample_user, monkeypatch):
+    """Test checkout with insufficient quantity"""
+    monkeypatch.setattr(User, 'get_by_ldap', lambda *a, **k: sample_user)
+    monkeypatch.setattr(Checkout, 'checkout_item', _insufficient_quantity)
+    response = client.post('/api/checkout', json={
+        'item_id': 1,
+        'user_ldap': 'jdoe',
+        'quantity': 100
+    })
+
+    assert response.status_code == 400
+    data = response.get_json()
+    assert 'error' in data
+
+
+def test_bulk_checkout_resolves_ldaps_once(client, sample_user, checkout_record, patched_models):
+    """Test bulk checkout looks up all LDAPs in a single query"""
+    patched_models.user.get_by_ldaps.return_value = {'jdoe': sample_user}
+    patched_models.checkout.checkout_items.return_value = [checkout_record, checkout_record]
+    response = client.post('/api/checkout/bulk', json={
+        'checkouts': [
+            {'item_id': 1, 'user_ldap': 'jdoe', 'quantity': 2},
+            {'item_id': 2, 'user_ldap': 'jdoe'}
+        ]
+    })
+
+    assert response.status_code == 201
+    data = response.get_json()
+    assert {'success': True, 'total_checkouts': 2}.items() <= data.items()
+    patched_models.user.get_by_ldaps.assert_called_once_with({'jdoe'})
+    checkouts = patched_models.checkout.checkout_items.call_args[0][0]
+    assert [c['user_id'] for c in checkouts] == [1, 1]
+    assert [c['quantity'] for c in checkouts] == [2, 1]
+
+
+def test_bulk_checkout_unknown_ldap(client, patched_models):
+    """Test bulk checkout with an unknown LDAP"""
+    patched_models.user.get_by_ldaps.return_value = {}
+    response = client.post('/api/checkout/bulk', json={
+        'checkouts': [{'item_id': 1, 'user_ldap': 'nonexistent'}]
+    })
+
+    assert response.status_code == 404
+    patched_models.checkout.checkout_items.assert_not_called()
+
+
+def test_bulk_checkout_missing_item_id(client):
+    """Test bulk checkout entry without item_id"""
+    response = client.post('/api/checkout/bulk', json={
+        'checkouts': [{'user_id': 1}]
+    })
+
+    assert response.status_code == 400
+    data = response.get_json()
+    assert 'checkouts[0]' in data['error']
+
+
+def test_bulk_checkout_invalid_quantity(client, monkeypatch):
+    """Test bulk checkout reports which entry has a bad quantity"""
+    mock_checkout = Mock()
+    monkeypatch.setattr(Checkout, 'checkout_items', mock_checkout)
+    response = client.post('/api/checkout/bulk', json={
+        'checkouts': [{'item_id': 1, 'user_id': 1}, {'item_id': 2, 'user_id': 1, 'quantity': 0}]
+    })
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'checkouts[1]: quantity must be a positive integer'
+    mock_checkout.assert_not_called()
+
+
+@pytest.mark.parametrize('body, error', [
+    ({'item_id': 'abc', 'user_id': 1}, 'item_id must be a positive integer'),
+    ({'item_id': 1, 'user_id': 1, 'quantity': -2}, 'quantity must be a positive integer'),
+    ({'item_id': 1, 'user_id': 1, 'quantity': True}, 'quantity must be a positive integer'),
+    ({'item_id': 1, 'user_id': [1]}, 'user_id must be a positive integer'),
+])
+def test_checkout_invalid_fields(client, body, error, monkeypatch):
+    """Test malformed checkout fields are rejected before any lookup"""
+    mock_checkout = Mock()
+    monkeypatch.setattr(Checkout, 'checkout_item', mock_checkout)
+    response = client.post('/api/checkout', json=body)
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == error
+    mock_checkout.assert_not_called()
+
+
+def test_checkout_coerces_numeric_strings(client, checkout_record, monkeypatch):
+    """Test numeric strings are accepted and passed on as integers"""
+    mock_checkout = Mock(return_value=checkout_record)
+    monkeypatch.setattr(Checkout, 'checkout_item', mock_checkout)
+    response = client.post('/api/checkout', json={'item_id': '1', 'user_id': '2', 'quantity': '3'})
+
+    assert response.status_code == 201
+    kwargs = mock_checkout.call_args[1]
+    assert (kwargs['item_id'], kwargs['user_id'], kwargs['quantity']) == (1, 2, 3)
+
+
+def test_checkin_item_success(client, sample_checkout_history, monkeypatch):
+    """Test successful check-in"""
+    history_record = {**sample_checkout_history, 'checkout_date': WEEK_AGO, 'return_date': NOW}
+
+    monkeypatch.setattr(Checkout, 'checkin_item', lambda *a, **k: history_record)
+    response = client.post('/api/checkout/checkin', json={
+        'checkout_id': 1,
+        'return_condition': 'good',
+        'return_notes': 'Returned on time'
+    })
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert {'success': True, 'message': 'Item checked in successfully'}.items() <= data.items()
+    assert data['history']['is_returned'] is True
+
+
+def test_checkin_item_missing_checkout_id(client):
+    """Test check-in without checkout_id"""
+    response = client.post('/api/checkout/checkin', json={
+        'return_condition': 'good'
+    })
+
+    assert response.status_code == 400
+    data = response.get_json()
+    assert 'error' in data
+    assert 'checkout_id' in data['error']
+
+
+def test_checkin_item_not_found(client, monkeypatch):
+    """Test check-in of non-existent checkout"""
+    monkeypatch.setattr(Checkout, 'checkin_item', _checkout_not_found)
+    response = client.post('/api/checkout/checkin', json={
+        'checkout_id': 999
+    })
+
+    assert response.status_code == 400
+    data = response.get_json()
+    assert 'error' in data
+
+
+def test_get_active_checkouts(client, active_checkouts, monkeypatch):
+    """Test getting all active checkouts"""
+    checkouts_json = json.dumps(active_checkouts, default=datetime.isoformat)
+    monkeypatch.setattr(Checkout, 'get_active_checkouts_json',
+                        lambda *a, **k: (1, checkouts_json))
+    response = client.get('/api/checkout/active')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    data = response.get_json()
+    assert {'success': True, 'total_active_checkouts': 1}.items() <= data.items()
+    assert len(data['checkouts']) == 1
+    assert data['checkouts'][0]['item_name'] == 'Test Drill'
+
+
+def test_get_active_checkouts_filtered_by_user(client, monkeypatch):
+    """Test getting active checkouts filtered by user"""
+    mock_get = Mock(return_value=(0, '[]'))
+    monkeypatch.setattr(Checkout, 'get_active_checkouts_json', mock_get)
+    response = client.get('/api/checkout/active', query_string={'user_id': [1, 2]})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['success'] is True
+    mock_get.assert_called_once_with(user_ids=[1, 2], item_ids=None)
+
+
+def test_get_overdue_checkouts(client, overdue_checkouts, monkeypatch):
+    """Test getting overdue checkouts"""
+    monkeypatch.setattr(Checkout, 'get_overdue_checkouts', lambda *a, **k: overdue_checkouts)
+    response = client.get('/api/checkout/overdue')
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert {'success': True, 'total_overdue': 1}.items() <= data.items()
+    assert len(data['checkouts']) == 1
+    assert data['checkouts'][0]['checkout_date'] == overdue_checkouts[0]['checkout_date'].isoformat()
+
+
+def test_get_user_checkouts(client, user_history, patched_models):
+    """Test getting user checkout history"""
+    # The route strips the user columns from each row in place
+    patched_models.checkout.get_user_checkout_history_by_ldap.return_value = [
+        dict(row) for row in user_history]
+    response = client.get('/api/checkout/user/jdoe')
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['success'] is True
+    assert data['user'] == {'ldap': 'jdoe', 'full_name': 'John Doe'}
+    assert data['total_records'] == 1
+    assert 'user_ldap' not in data['history'][0]
+    # The user is resolved by the history query itself
+    patched_models.user.get_by_ldap.assert_not_called()
+    patched_models.checkout.get_user_checkout_history_by_ldap.assert_called_once_with(
+        'jdoe', limit=50, before_id=None, stream=True)
+
+
+def test_get_user_checkouts_not_found(client, monkeypatch):
+    """Test getting history for non-existent user"""
+    monkeypatch.setattr(Checkout, 'get_user_checkout_history_by_ldap', lambda *a, **k: [])
+    response = client.get('/api/checkout/user/nonexistent')
+
+    assert response.status_code == 404
+    data = response.get_json()
+    assert 'error' in data
+
+
+def test_get_user_checkouts_no_history(client, monkeypatch):
+    """Test a known user without history gets an empty list"""
+    row = {'user_ldap': 'jdoe', 'user_full_name': 'John Doe', 'history_id': None}
+
+    monkeypatch.setattr(Checkout, 'get_user_checkout_history_by_ldap', lambda *a, **k: [row])
+    response = client.get('/api/checkout/user/jdoe', query_string={'limit': 10})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['success'] is True
+    assert data['user']['ldap'] == 'jdoe'
+    assert data['history'] == []
+    assert data['total_records'] == 0
+
+
+def test_get_item_history(client, item_history, monkeypatch):
+    """Test getting item checkout history"""
+    monkeypatch.setattr(Checkout, 'get_item_checkout_history', lambda *a, **k: item_history)
+    response = client.get('/api/checkout/item/1/history')
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert {'success': True, 'item_id': 1, 'total_records': 1}.items() <= data.items()
+    assert data['history'][0]['ldap'] == 'jdoe'
+    assert data['history'][0]['checkout_date'] == item_history[0]['checkout_date'].isoformat()
+
+
+def test_get_item_history_custom_limit(client, monkeypatch):
+    """Test getting item history with custom limit"""
+    monkeypatch.setattr(Checkout, 'get_item_checkout_history', lambda *a, **k: [])
+    response = client.get('/api/checkout/item/1/history', query_string={'limit': 25})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['success'] is True
+    assert data['history'] == []
+    assert data['total_records'] == 0
+
+
+def test_get_item_history_limit_capped(client, monkeypatch):
+    """Test oversized limits are capped"""
+    mock_get = Mock(return_value=[])
+    monkeypatch.setattr(Checkout, 'get_item_checkout_history', mock_get)
+    response = client.get('/api/checkout/item/1/history', query_string={'limit': 100000})
+
+    assert response.status_code == 200
+    mock_get.assert_called_once_with(1, limit=1000, before_id=None, stream=True)
+
+
+def test_get_item_history_next_cursor(client, monkeypatch):
+    """Test a full page returns the last history_id as next_cursor"""
+    history = [{'history_id': 9}, {'history_id': 7}]
+
+    mock_get = Mock(return_value=history)
+    monkeypatch.setattr(Checkout, 'get_item_checkout_history', mock_get)
+    response = client.get('/api/checkout/item/1/history', query_string={'limit': 2, 'before_id': 10})
+
+    data = response.get_json()
+    assert data['next_cursor'] == 7
+    mock_get.assert_called_once_with(1, limit=2, before_id=10, stream=True)
+
+
+def test_get_item_history_last_page(client, monkeypatch):
+    """Test a short page has no next_cursor"""
+    monkeypatch.setattr(Checkout, 'get_item_checkout_history', lambda *a, **k: [{'history_id': 3}])
+    response = client.get('/api/checkout/item/1/history', query_string={'limit': 2})
+
+    assert response.get_json()['next_cursor'] is None
+
+
+def test_get_item_history_query_error(client, monkeypatch):
+    """Test a failing history query still returns a 500 before streaming"""
+    def failing_rows():
+        raise Exception('connection lost')
+        yield
+
+    monkeypatch.setattr(Checkout, 'get_item_checkout_history', lambda *a, **k: failing_rows())
+    response = client.get('/api/checkout/item/1/history')
+
+    assert response.status_code == 500
+    assert 'connection lost' in response.get_json()['error']
+
+
+def test_checkout_no_data(client):
+    """Test checkout endpoint with no JSON data"""
+    response = client.post('/api/checkout', json=None)
+
+    assert response.status_code == 400
+    data = response.get_json()
+    assert 'error' in data
+
+
+def test_checkin_no_data(client):
+    """Test check-in endpoint with no JSON data"""
+    response = client.post('/api/checkout/checkin', json=None)
+
+    assert response.status_code == 400
+    data = response.get_json()
+    assert 'error' in data
+
+
+@pytest.mark.parametrize('url', ['/api/checkout', '/api/checkout/bulk', '/api/checkout/checkin'],
+                         ids=['checkout', 'bulk', 'checkin'])
+def test_checkout_malformed_json(client, url):
+    """Test malformed JSON bodies get a JSON 400 saying so, not a 500"""
+    response = client.post(url, data='{"item_id": 1,', content_type='application/json')
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Invalid JSON body'
+
+
+@pytest.mark.parametrize('url, body, error', [
+    ('/api/checkout', [{'item_id': 1, 'user_id': 1}], 'Checkout must be a JSON object'),
+    ('/api/checkout/bulk', [{'item_id': 1, 'user_id': 1}], 'No checkouts provided'),
+    ('/api/checkout/bulk', {'checkouts': 'abc'}, 'checkouts must be a list'),
+    ('/api/checkout/bulk', {'checkouts': [{'item_id': 1, 'user_id': 1}, 7]},
+     'checkouts[1]: Checkout must be a JSON object'),
+    ('/api/checkout/checkin', [1], 'Check-in must be a JSON object'),
+], ids=['checkout_list', 'bulk_list', 'bulk_checkouts_string', 'bulk_entry_int', 'checkin_list'])
+def test_checkout_non_object_json(client, url, body, error):
+    """Test JSON bodies and bulk entries that are not objects get a 400, not a 500"""
+    response = client.post(url, json=body)
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == error
+
+
+def test_checkout_expected_return_utc(client, checkout_record, monkeypatch):
+    """Test expected_return_datetime accepts a UTC 'Z' suffix"""
+    mock_checkout = Mock(return_value=checkout_record)
+    monkeypatch.setattr(Checkout, 'checkout_item', mock_checkout)
+    response = client.post('/api/checkout', json={
+        'item_id': 1,
+        'user_id': 1,
+        'expected_return_datetime': '2024-10-20T18:00:00Z'
+    })
+
+    assert response.status_code == 201
+    expected_return = mock_checkout.call_args[1]['expected_return_datetime']
+    assert expected_return == datetime(2024, 10, 20, 18, 0, tzinfo=timezone.utc)
+
+
+def test_checkout_expected_return_invalid(client):
+    """Test an unparseable expected_return_datetime is a 400"""
+    response = client.post('/api/checkout', json={
+        'item_id': 1,
+        'user_id': 1,
+        'expected_return_datetime': 'next tuesday'
+    })
+
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
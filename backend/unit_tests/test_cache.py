@@ -0,0 +1,54 @@
+"""
+Unit tests for in-process caches
+"""
+
+import pytest
+from unittest.mock import patch
+from cache import TTLCache
+
+# Mock-only tests, selectable with -m unit
+pytestmark = pytest.mark.unit
+
+
+class TestTTLCache:
+    """Test suite for TTLCache"""
+
+    def test_set_and_get(self):
+        """Test cached values are returned until they expire"""
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set('key', {'value': 1})
+
+        assert cache.get('key') == {'value': 1}
+        assert cache.get('missing') is None
+
+    def test_expired_entry(self):
+        """Test entries older than the TTL are dropped"""
+        cache = TTLCache(maxsize=10, ttl=60)
+
+        with patch('cache.time.monotonic', return_value=100.0):
+            cache.set('key', 'value')
+        with patch('cache.time.monotonic', return_value=160.0):
+            assert cache.get('key') is None
+
+    def test_evicts_oldest_when_full(self):
+        """Test the oldest entry is evicted once maxsize is reached"""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('c', 3)
+
+        assert cache.get('a') is None
+        assert cache.get('b') == 2
+        assert cache.get('c') == 3
+
+    def test_pop_and_clear(self):
+        """Test removing single entries and clearing the cache"""
+        cache = TTLCache()
+        cache.set('a', 1)
+        cache.set('b', 2)
+
+        assert cache.pop('a') == 1
+        assert cache.pop('a') is None
+
+        cache.clear()
+        assert cache.get('b') is None
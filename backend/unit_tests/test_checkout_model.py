@@ -2,300 +2,405 @@
 Unit tests for Checkout model
 """
 
+import re
 import pytest
-from unittest.mock import patch, MagicMock
-from datetime import datetime, timedelta
+from unittest.mock import Mock
+from datetime import timedelta
 from models.checkout import Checkout
 
+# Mock-only tests, selectable with -m unit, that all run against a mocked
+# execute_query, requested by name when configured
+pytestmark = [pytest.mark.unit, pytest.mark.usefixtures('mock_execute_query')]
+
+# Default checkout period, built once rather than per test
+_LOAN_PERIOD = timedelta(days=7)
+
+# Error messages the failure tests expect, compiled once for pytest.raises
+_USER_NOT_FOUND = re.compile(r'User .* not found')
+_CHECKOUT_NOT_FOUND = re.compile(r'Checkout .* not found')
+
+# SQL fragments each query below must contain
+_CHECKOUT_SQL = (
+    'UPDATE inventory.items',
+    'quantity_available >= %(quantity)s',
+    'FROM inventory.users WHERE user_id = %(user_id)s',
+    'INSERT INTO inventory.checkout (',
+    'INSERT INTO inventory.checkout_history',
+)
+_USER_HISTORY_SQL = (
+    'FROM inventory.v_checkout_history h',
+    'JOIN inventory.users u ON u.ldap = h.ldap',
+    'WHERE u.user_id = %s',
+    'ORDER BY h.history_id DESC',
+    'LIMIT %s',
+)
+_USER_HISTORY_BY_LDAP_SQL = (
+    'WHERE ldap = %s AND active = TRUE',
+    'LEFT JOIN inventory.v_checkout_history h ON h.ldap = u.ldap',
+    'AND h.history_id < %s ORDER BY h.history_id DESC NULLS LAST',
+)
+_ITEM_HISTORY_SQL = (
+    'FROM inventory.v_checkout_history',
+    'WHERE item_id = %s',
+    'ORDER BY history_id DESC',
+    'LIMIT %s',
+)
+# History row columns the check-in tests share, completed per test
+_HISTORY_BASE = {
+    'history_id': 1,
+    'item_id': 1,
+    'user_id': 1,
+    'quantity': 2,
+    'is_returned': True,
+    'checkout_condition': 'good',
+    'return_condition': 'good',
+    'checkout_notes': 'Test checkout',
+}
+# Item row returned by the check-in's quantity UPDATE
+_RESTOCKED_ITEM = {
+    'item_id': 1, 'item_name': 'Test Drill', 'quantity_total': 10,
+    'quantity_available': 10, 'quantity_checked_out': 0,
+}
+
+
+def test_checkout_item_success(mock_db_cursor, now):
+    """Test successful item checkout"""
+    expected_return = now + _LOAN_PERIOD
+    mock_db_cursor.fetchone.return_value = {
+        'checkout_id': 1,
+        'item_id': 1,
+        'user_id': 1,
+        'quantity': 2,
+        'checkout_date': now,
+        'expected_return_datetime': expected_return,
+        'checkout_condition': 'good',
+        'notes': 'Test checkout',
+        'created_at': now
+    }
+
+    result = Checkout.checkout_item(
+        item_id=1,
+        user_id=1,
+        quantity=2,
+        expected_return_datetime=expected_return,
+        checkout_condition='good',
+        notes='Test checkout'
+    )
+
+    assert result['checkout_id'] == 1
+    assert result['quantity'] == 2
+    # Validation, quantity update and both INSERTs share one statement
+    assert mock_db_cursor.execute.call_count == 1
+    query, params = mock_db_cursor.execute.call_args[0]
+    assert all(fragment in query for fragment in _CHECKOUT_SQL)
+    assert params['expected_return'] == expected_return
+
+
+def test_checkout_item_default_return_date(mock_db_cursor, now):
+    """Test checkout with default return date (7 days)"""
+    mock_db_cursor.fetchone.return_value = {
+        'checkout_id': 1,
+        'item_id': 1,
+        'user_id': 1,
+        'quantity': 1,
+        'checkout_date': now,
+        'expected_return_datetime': now + _LOAN_PERIOD,
+        'checkout_condition': 'good',
+        'notes': None,
+        'created_at': now
+    }
+
+    result = Checkout.checkout_item(item_id=1, user_id=1, quantity=1)
+
+    assert result is not None
+    # Check that expected_return_datetime is set
+    assert result['expected_return_datetime'] is not None
+    # Default is left to the database rather than computed in Python
+    query, params = mock_db_cursor.execute.call_args[0]
+    assert "COALESCE(%(expected_return)s, CURRENT_TIMESTAMP + INTERVAL '7 days')" in query
+    assert params['expected_return'] is None
+
+
+def test_checkout_item_user_not_found(mock_db_cursor):
+    """Test checkout fails when user not found"""
+    mock_db_cursor.fetchone.side_effect = [
+        None,  # nothing inserted
+        {'user_found': False, 'quantity_available': 5}
+    ]
+
+    with pytest.raises(ValueError, match=_USER_NOT_FOUND):
+        Checkout.checkout_item(item_id=1, user_id=999, quantity=1)
+
+
+def test_checkout_item_item_not_found(mock_db_cursor):
+    """Test checkout fails when item not found"""
+    mock_db_cursor.fetchone.side_effect = [
+        None,
+        {'user_found': True, 'quantity_available': None}
+    ]
+
+    with pytest.raises(ValueError, match="Item 999 not found"):
+        Checkout.checkout_item(item_id=999, user_id=1, quantity=1)
+
+
+def test_checkout_item_insufficient_quantity(mock_db_cursor):
+    """Test checkout fails with insufficient quantity"""
+    mock_db_cursor.fetchone.side_effect = [
+        None,
+        {'user_found': True, 'quantity_available': 5}
+    ]
+
+    with pytest.raises(ValueError, match="Insufficient quantity. Available: 5, Requested: 100"):
+        Checkout.checkout_item(item_id=1, user_id=1, quantity=100)
+
+
+def test_checkout_items_single_transaction(mock_db_cursor):
+    """Test bulk checkout validates users once and shares one cursor"""
+    mock_db_cursor.fetchall.return_value = [{'user_id': 1}, {'user_id': 2}]
+    mock_db_cursor.fetchone.side_effect = [
+        {'checkout_id': 10, 'item_id': 1},
+        {'checkout_id': 11, 'item_id': 2}
+    ]
+
+    result = Checkout.checkout_items([
+        {'item_id': 1, 'user_id': 1, 'quantity': 2},
+        {'item_id': 2, 'user_id': 2, 'quantity': 1}
+    ])
+
+    assert [r['checkout_id'] for r in result] == [10, 11]
+    # One user validation, then a single statement per checkout
+    assert mock_db_cursor.execute.call_count == 3
+    assert 'user_id = ANY(%s)' in mock_db_cursor.execute.call_args_list[0][0][0]
+
+
+def test_checkout_items_user_not_found(mock_db_cursor):
+    """Test bulk checkout fails before any update when a user is missing"""
+    mock_db_cursor.fetchall.return_value = [{'user_id': 1}]
+
+    with pytest.raises(ValueError, match="User 2 not found"):
+        Checkout.checkout_items([
+            {'item_id': 1, 'user_id': 1, 'quantity': 1},
+            {'item_id': 2, 'user_id': 2, 'quantity': 1}
+        ])
+
+    assert mock_db_cursor.execute.call_count == 1
+
+
+@pytest.mark.parametrize('late_return, return_notes', [
+    (False, 'Returned on time'),
+    (True, 'Returned late'),
+], ids=['on_time', 'late'])
+def test_checkin_item(mock_db_cursor, now, sample_checkout, late_return, return_notes):
+    """Test check-in restocks the item and closes the history row, judged late by the database"""
+    mock_db_cursor.fetchone.side_effect = [
+        sample_checkout,  # SELECT from checkout
+        _RESTOCKED_ITEM,  # UPDATE items
+        {  # UPDATE checkout_history
+            **_HISTORY_BASE,
+            'checkout_date': sample_checkout['checkout_date'],
+            'return_date': now,
+            'expected_return_datetime': sample_checkout['expected_return_datetime'],
+            'late_return': late_return,
+            'return_notes': return_notes
+        }
+    ]
+
+    result = Checkout.checkin_item(1, return_condition='good', return_notes=return_notes)
+
+    assert result['is_returned'] is True
+    assert result['late_return'] is late_return
+    # Quantities are restored on the check-in's own cursor, inside its transaction
+    restock_query, restock_params = mock_db_cursor.execute.call_args_list[1][0]
+    assert 'UPDATE inventory.items' in restock_query
+    assert restock_params == (2, 2, 1, 2)
+    # Verify DELETE from checkout and UPDATE history
+    assert mock_db_cursor.execute.call_count == 4
+    # History row is matched on checkout_id and lateness comes from the database clock
+    update_query, update_params = mock_db_cursor.execute.call_args[0]
+    assert 'WHERE checkout_id = %s' in update_query
+    assert 'EXTRACT(EPOCH' not in update_query
+    assert 'late_return = (CURRENT_TIMESTAMP > expected_return_datetime)' in update_query
+    assert update_params == ('good', return_notes, 1)
+
+
+def test_checkin_item_not_found(mock_db_cursor):
+    """Test check-in fails when checkout not found"""
+    mock_db_cursor.fetchone.return_value = None
+
+    with pytest.raises(ValueError, match=_CHECKOUT_NOT_FOUND):
+        Checkout.checkin_item(999)
+
+
+@pytest.mark.parametrize('kwargs, fragments, params', [
+    ({}, ['FROM inventory.v_active_checkouts', 'ORDER BY checkout_date DESC'], None),
+    ({'user_ids': 1}, ['AND user_id = ANY(%s::int[])'], ([1],)),
+    ({'item_ids': 1}, ['AND item_id = ANY(%s::int[])'], ([1],)),
+    ({'user_ids': 1, 'item_ids': 1},
+     ['AND user_id = ANY(%s::int[])', 'AND item_id = ANY(%s::int[])'], ([1], [1])),
+], ids=['all', 'by_user', 'by_item', 'by_user_and_item'])
+def test_get_active_checkouts(mock_execute_query, kwargs, fragments, params):
+    """Test getting active checkouts, optionally filtered by user and/or item"""
+    checkouts = [{'checkout_id': 1, 'item_id': 1, 'user_id': 1}]
+
+    mock_execute_query.return_value = checkouts
+    result = Checkout.get_active_checkouts(**kwargs)
+
+    assert result == checkouts
+    query, query_params = mock_execute_query.call_args[0]
+    for fragment in fragments:
+        assert fragment in query
+    assert query_params == params
+
+
+def test_get_active_checkouts_multiple_users(mock_execute_query):
+    """Test getting active checkouts for several users in one query"""
+    mock_execute_query.return_value = []
+    Checkout.get_active_checkouts(user_ids=[1, 2, 3])
+
+    mock_execute_query.assert_called_once()
+    assert mock_execute_query.call_args[0][1] == ([1, 2, 3],)
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'user_ids': []},
+    {'item_ids': []},
+    {'user_ids': [1], 'item_ids': []},
+], ids=['no_users', 'no_items', 'user_and_no_items'])
+def test_get_active_checkouts_empty_filter(mock_execute_query, kwargs):
+    """Test an explicit empty filter matches nothing without querying"""
+    assert Checkout.get_active_checkouts(**kwargs) == []
+    assert Checkout.get_active_checkouts_json(**kwargs) == (0, '[]')
+    mock_execute_query.assert_not_called()
+
+
+def test_get_active_checkouts_json(mock_execute_query):
+    """Test active checkouts can be aggregated to JSON by the database"""
+    row = {'total': 2, 'checkouts': '[{"checkout_id": 2}, {"checkout_id": 1}]'}
+
+    mock_execute_query.return_value = row
+    total, checkouts_json = Checkout.get_active_checkouts_json(item_ids=[5])
+
+    assert total == 2
+    assert checkouts_json == row['checkouts']
+    query, params = mock_execute_query.call_args[0]
+    assert "COALESCE(json_agg(t ORDER BY t.checkout_date DESC), '[]')::text" in query
+    assert 'AND item_id = ANY(%s::int[])' in query
+    assert params == ([5],)
+    assert mock_execute_query.call_args[1]['fetch_one'] is True
+
+
+def test_get_overdue_checkouts(mock_execute_query):
+    """Test getting overdue checkouts"""
+    overdue_checkouts = [
+        {'checkout_id': 1, 'is_overdue': True, 'days_overdue': 5},
+        {'checkout_id': 2, 'is_overdue': True, 'days_overdue': 2}
+    ]
+
+    mock_execute_query.return_value = overdue_checkouts
+    result = Checkout.get_overdue_checkouts()
+
+    assert len(result) == 2
+    query = mock_execute_query.call_args[0][0]
+    assert 'FROM inventory.checkout c' in query
+    assert 'WHERE c.expected_return_datetime < CURRENT_TIMESTAMP' in query
+    # Oldest due date first is the same as most days overdue first
+    assert 'ORDER BY c.expected_return_datetime ASC' in query
+
+
+@pytest.mark.parametrize('limit_kwarg, expected_limit', [({}, 50), ({'limit': 10}, 10)],
+                         ids=['default', 'custom'])
+def test_get_user_checkout_history(mock_execute_query, limit_kwarg, expected_limit):
+    """Test getting checkout history for a user with the default and a custom limit"""
+    history = [
+        {'history_id': 1, 'ldap': 'jdoe', 'is_returned': True},
+        {'history_id': 2, 'ldap': 'jdoe', 'is_returned': True}
+    ]
 
-class TestCheckoutModel:
-    """Test suite for Checkout model"""
-
-    def test_checkout_item_success(self, mock_db_cursor, sample_user, sample_item):
-        """Test successful item checkout"""
-        expected_return = datetime.now() + timedelta(days=7)
-
-        # Mock User.get_by_id
-        with patch('models.user.User.get_by_id', return_value=sample_user):
-            # Mock Item.update_quantities
-            with patch('models.item.Item.update_quantities', return_value=sample_item):
-                mock_db_cursor.fetchone.return_value = {
-                    'checkout_id': 1,
-                    'item_id': 1,
-                    'user_id': 1,
-                    'quantity': 2,
-                    'checkout_date': datetime.now(),
-                    'expected_return_datetime': expected_return,
-                    'checkout_condition': 'good',
-                    'notes': 'Test checkout',
-                    'created_at': datetime.now()
-                }
-
-                result = Checkout.checkout_item(
-                    item_id=1,
-                    user_id=1,
-                    quantity=2,
-                    expected_return_datetime=expected_return,
-                    checkout_condition='good',
-                    notes='Test checkout'
-                )
-
-                assert result['checkout_id'] == 1
-                assert result['quantity'] == 2
-                # Verify two INSERT queries: checkout and history
-                assert mock_db_cursor.execute.call_count == 2
-
-    def test_checkout_item_default_return_date(self, mock_db_cursor, sample_user, sample_item):
-        """Test checkout with default return date (7 days)"""
-        with patch('models.user.User.get_by_id', return_value=sample_user):
-            with patch('models.item.Item.update_quantities', return_value=sample_item):
-                mock_db_cursor.fetchone.return_value = {
-                    'checkout_id': 1,
-                    'item_id': 1,
-                    'user_id': 1,
-                    'quantity': 1,
-                    'checkout_date': datetime.now(),
-                    'expected_return_datetime': datetime.now() + timedelta(days=7),
-                    'checkout_condition': 'good',
-                    'notes': None,
-                    'created_at': datetime.now()
-                }
-
-                result = Checkout.checkout_item(item_id=1, user_id=1, quantity=1)
-
-                assert result is not None
-                # Check that expected_return_datetime is set
-                assert result['expected_return_datetime'] is not None
-
-    def test_checkout_item_user_not_found(self, mock_db_cursor):
-        """Test checkout fails when user not found"""
-        with patch('models.user.User.get_by_id', return_value=None):
-            with pytest.raises(ValueError, match="User .* not found"):
-                Checkout.checkout_item(item_id=1, user_id=999, quantity=1)
-
-    def test_checkout_item_insufficient_quantity(self, mock_db_cursor, sample_user):
-        """Test checkout fails with insufficient quantity"""
-        with patch('models.user.User.get_by_id', return_value=sample_user):
-            with patch('models.item.Item.update_quantities', side_effect=ValueError("Insufficient quantity")):
-                with pytest.raises(ValueError, match="Insufficient quantity"):
-                    Checkout.checkout_item(item_id=1, user_id=1, quantity=100)
-
-    def test_checkin_item_success(self, mock_db_cursor, sample_checkout):
-        """Test successful item check-in"""
-        # Mock the checkout record with future return date (not overdue)
-        checkout_record = sample_checkout.copy()
-        checkout_record['expected_return_datetime'] = datetime.now() + timedelta(days=1)
-        checkout_record['checkout_date'] = datetime.now() - timedelta(days=6)
-
-        mock_db_cursor.fetchone.side_effect = [
-            checkout_record,  # SELECT from checkout
-            {  # UPDATE checkout_history
-                'history_id': 1,
-                'item_id': 1,
-                'user_id': 1,
-                'quantity': 2,
-                'checkout_date': checkout_record['checkout_date'],
-                'return_date': datetime.now(),
-                'expected_return_datetime': checkout_record['expected_return_datetime'],
-                'is_returned': True,
-                'late_return': False,
-                'checkout_condition': 'good',
-                'return_condition': 'good',
-                'checkout_notes': 'Test checkout',
-                'return_notes': 'Returned on time'
-            }
-        ]
-
-        with patch('models.item.Item.update_quantities'):
-            result = Checkout.checkin_item(1, return_condition='good', return_notes='Returned on time')
-
-            assert result['is_returned'] is True
-            assert result['late_return'] is False
-            # Verify Item.update_quantities called for check-in
-            # Verify DELETE from checkout and UPDATE history
-            assert mock_db_cursor.execute.call_count == 3
-
-    def test_checkin_item_overdue(self, mock_db_cursor, sample_checkout):
-        """Test check-in of overdue item"""
-        # Mock overdue checkout
-        checkout_record = sample_checkout.copy()
-        checkout_record['expected_return_datetime'] = datetime.now() - timedelta(days=2)
-        checkout_record['checkout_date'] = datetime.now() - timedelta(days=9)
-
-        mock_db_cursor.fetchone.side_effect = [
-            checkout_record,
-            {
-                'history_id': 1,
-                'item_id': 1,
-                'user_id': 1,
-                'quantity': 2,
-                'checkout_date': checkout_record['checkout_date'],
-                'return_date': datetime.now(),
-                'expected_return_datetime': checkout_record['expected_return_datetime'],
-                'is_returned': True,
-                'late_return': True,
-                'checkout_condition': 'good',
-                'return_condition': 'good',
-                'checkout_notes': 'Test checkout',
-                'return_notes': 'Returned late'
-            }
-        ]
-
-        with patch('models.item.Item.update_quantities'):
-            result = Checkout.checkin_item(1, return_condition='good', return_notes='Returned late')
-
-            assert result['is_returned'] is True
-            assert result['late_return'] is True
-
-    def test_checkin_item_not_found(self, mock_db_cursor):
-        """Test check-in fails when checkout not found"""
-        mock_db_cursor.fetchone.return_value = None
-
-        with pytest.raises(ValueError, match="Checkout .* not found"):
-            Checkout.checkin_item(999)
-
-    def test_get_active_checkouts_all(self):
-        """Test getting all active checkouts"""
-        checkouts = [
-            {'checkout_id': 1, 'item_id': 1, 'user_id': 1},
-            {'checkout_id': 2, 'item_id': 2, 'user_id': 2}
-        ]
-
-        with patch('models.checkout.execute_query', return_value=checkouts) as mock_query:
-            result = Checkout.get_active_checkouts()
-
-            assert len(result) == 2
-            call_args = mock_query.call_args
-            assert 'FROM v_active_checkouts' in call_args[0][0]
-            assert 'ORDER BY checkout_date DESC' in call_args[0][0]
-
-    def test_get_active_checkouts_by_user(self):
-        """Test getting active checkouts filtered by user"""
-        checkouts = [{'checkout_id': 1, 'item_id': 1, 'user_id': 1}]
-
-        with patch('models.checkout.execute_query', return_value=checkouts) as mock_query:
-            result = Checkout.get_active_checkouts(user_id=1)
-
-            assert len(result) == 1
-            call_args = mock_query.call_args
-            assert 'AND user_id = %s' in call_args[0][0]
-            assert 1 in call_args[0][1]
-
-    def test_get_active_checkouts_by_item(self):
-        """Test getting active checkouts filtered by item"""
-        checkouts = [{'checkout_id': 1, 'item_id': 1, 'user_id': 1}]
-
-        with patch('models.checkout.execute_query', return_value=checkouts) as mock_query:
-            result = Checkout.get_active_checkouts(item_id=1)
-
-            assert len(result) == 1
-            call_args = mock_query.call_args
-            assert 'AND item_id = %s' in call_args[0][0]
-            assert 1 in call_args[0][1]
-
-    def test_get_active_checkouts_by_user_and_item(self):
-        """Test getting active checkouts filtered by both user and item"""
-        checkouts = [{'checkout_id': 1, 'item_id': 1, 'user_id': 1}]
-
-        with patch('models.checkout.execute_query', return_value=checkouts) as mock_query:
-            result = Checkout.get_active_checkouts(user_id=1, item_id=1)
-
-            assert len(result) == 1
-            call_args = mock_query.call_args
-            assert 'AND user_id = %s' in call_args[0][0]
-            assert 'AND item_id = %s' in call_args[0][0]
-            assert call_args[0][1] == (1, 1)
-
-    def test_get_overdue_checkouts(self):
-        """Test getting overdue checkouts"""
-        overdue_checkouts = [
-            {'checkout_id': 1, 'is_overdue': True, 'days_overdue': 5},
-            {'checkout_id': 2, 'is_overdue': True, 'days_overdue': 2}
-        ]
-
-        with patch('models.checkout.execute_query', return_value=overdue_checkouts) as mock_query:
-            result = Checkout.get_overdue_checkouts()
-
-            assert len(result) == 2
-            call_args = mock_query.call_args
-            assert 'WHERE is_overdue = TRUE' in call_args[0][0]
-            assert 'ORDER BY days_overdue DESC' in call_args[0][0]
-
-    def test_get_user_checkout_history(self, sample_user):
-        """Test getting checkout history for a user"""
-        history = [
-            {'history_id': 1, 'ldap': 'jdoe', 'is_returned': True},
-            {'history_id': 2, 'ldap': 'jdoe', 'is_returned': True}
-        ]
-
-        with patch('models.checkout.execute_query', return_value=history) as mock_query:
-            with patch('models.user.User.get_by_id', return_value=sample_user):
-                result = Checkout.get_user_checkout_history(1)
-
-                assert len(result) == 2
-                call_args = mock_query.call_args
-                assert 'FROM v_checkout_history' in call_args[0][0]
-                assert 'WHERE ldap = %s' in call_args[0][0]
-                assert 'ORDER BY checkout_date DESC' in call_args[0][0]
-                assert 'LIMIT %s' in call_args[0][0]
-
-    def test_get_user_checkout_history_user_not_found(self):
-        """Test getting history for non-existent user"""
-        with patch('models.user.User.get_by_id', return_value=None):
-            result = Checkout.get_user_checkout_history(999)
-
-            assert result == []
-
-    def test_get_user_checkout_history_custom_limit(self, sample_user):
-        """Test getting checkout history with custom limit"""
-        with patch('models.checkout.execute_query', return_value=[]) as mock_query:
-            with patch('models.user.User.get_by_id', return_value=sample_user):
-                result = Checkout.get_user_checkout_history(1, limit=10)
-
-                call_args = mock_query.call_args
-                assert call_args[0][1] == ('jdoe', 10)
-
-    def test_get_item_checkout_history(self):
-        """Test getting checkout history for an item"""
-        history = [
-            {'history_id': 1, 'item_id': 1, 'is_returned': True},
-            {'history_id': 2, 'item_id': 1, 'is_returned': True}
-        ]
-
-        with patch('models.checkout.execute_query', return_value=history) as mock_query:
-            result = Checkout.get_item_checkout_history(1)
-
-            assert len(result) == 2
-            call_args = mock_query.call_args
-            assert 'FROM v_checkout_history' in call_args[0][0]
-            assert 'WHERE item_id = %s' in call_args[0][0]
-            assert 'ORDER BY checkout_date DESC' in call_args[0][0]
-            assert 'LIMIT %s' in call_args[0][0]
-
-    def test_get_item_checkout_history_custom_limit(self):
-        """Test getting item history with custom limit"""
-        with patch('models.checkout.execute_query', return_value=[]) as mock_query:
-            result = Checkout.get_item_checkout_history(1, limit=25)
-
-            call_args = mock_query.call_args
-            assert call_args[0][1] == (1, 25)
-
-    def test_get_checkout_by_id(self):
-        """Test getting a specific checkout by ID"""
-        checkout = {'checkout_id': 1, 'item_id': 1, 'user_id': 1}
-
-        with patch('models.checkout.execute_query', return_value=checkout) as mock_query:
-            result = Checkout.get_checkout_by_id(1)
-
-            assert result == checkout
-            call_args = mock_query.call_args
-            assert 'FROM v_active_checkouts' in call_args[0][0]
-            assert 'WHERE checkout_id = %s' in call_args[0][0]
-            assert call_args[0][1] == (1,)
-
-    def test_get_checkout_by_id_not_found(self):
-        """Test getting non-existent checkout by ID"""
-        with patch('models.checkout.execute_query', return_value=None):
-            result = Checkout.get_checkout_by_id(999)
-
-            assert result is None
\ No newline at end of file
+    mock_execute_query.return_value = history
+    result = Checkout.get_user_checkout_history(1, **limit_kwarg)
+
+    assert len(result) == 2
+    # User ldap is resolved by the JOIN, not a separate lookup
+    mock_execute_query.assert_called_once()
+    query, params = mock_execute_query.call_args[0]
+    assert params == (1, expected_limit)
+    assert all(fragment in query for fragment in _USER_HISTORY_SQL)
+
+
+def test_get_user_checkout_history_user_not_found(mock_execute_query):
+    """Test getting history for non-existent user"""
+    mock_execute_query.return_value = []
+    result = Checkout.get_user_checkout_history(999)
+
+    assert result == []
+
+
+def test_get_user_checkout_history_by_ldap(mock_execute_query):
+    """Test the user and their history are read in one query"""
+    mock_execute_query.return_value = []
+    Checkout.get_user_checkout_history_by_ldap('jdoe', limit=10, before_id=99)
+
+    query, params = mock_execute_query.call_args[0]
+    assert all(fragment in query for fragment in _USER_HISTORY_BY_LDAP_SQL)
+    assert params == ('jdoe', 99, 10)
+
+
+@pytest.mark.parametrize('limit_kwarg, expected_limit', [({}, 50), ({'limit': 25}, 25)],
+                         ids=['default', 'custom'])
+def test_get_item_checkout_history(mock_execute_query, limit_kwarg, expected_limit):
+    """Test getting checkout history for an item with the default and a custom limit"""
+    history = [
+        {'history_id': 1, 'item_id': 1, 'is_returned': True},
+        {'history_id': 2, 'item_id': 1, 'is_returned': True}
+    ]
+
+    mock_execute_query.return_value = history
+    result = Checkout.get_item_checkout_history(1, **limit_kwarg)
+
+    assert len(result) == 2
+    query, params = mock_execute_query.call_args[0]
+    assert params == (1, expected_limit)
+    assert all(fragment in query for fragment in _ITEM_HISTORY_SQL)
+
+
+def test_get_item_checkout_history_before_id(mock_execute_query):
+    """Test keyset pagination of item history with before_id"""
+    mock_execute_query.return_value = []
+    Checkout.get_item_checkout_history(1, limit=25, before_id=500)
+
+    query, params = mock_execute_query.call_args[0]
+    assert 'AND history_id < %s' in query
+    assert 'ORDER BY history_id DESC' in query
+    assert params == (1, 500, 25)
+
+
+def test_get_item_checkout_history_stream(mock_execute_query, monkeypatch):
+    """Test streamed history reads go through a server-side cursor"""
+    mock_stream = Mock(return_value=iter([]))
+    monkeypatch.setattr('models.checkout.stream_query', mock_stream)
+    Checkout.get_item_checkout_history(1, limit=25, stream=True)
+
+    mock_execute_query.assert_not_called()
+    assert mock_stream.call_args[0][1] == (1, 25)
+
+
+def test_get_checkout_by_id(mock_execute_query):
+    """Test getting a specific checkout by ID"""
+    checkout = {'checkout_id': 1, 'item_id': 1, 'user_id': 1}
+
+    mock_execute_query.return_value = checkout
+    result = Checkout.get_checkout_by_id(1)
+
+    assert result == checkout
+    query, params = mock_execute_query.call_args[0]
+    assert 'FROM inventory.v_active_checkouts' in query
+    assert 'WHERE checkout_id = %s' in query
+    assert params == (1,)
+
+
+def test_get_checkout_by_id_not_found(mock_execute_query):
+    """Test getting non-existent checkout by ID"""
+    mock_execute_query.return_value = None
+    result = Checkout.get_checkout_by_id(999)
+
+    assert result is None
\ No newline at end of file
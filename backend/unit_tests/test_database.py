@@ -0,0 +1,277 @@
+"""
+Unit tests for database helpers
+"""
+
+import time
+
+import psycopg2
+import pytest
+from unittest.mock import MagicMock, patch
+from app import create_app
+from database import (
+    Database, _connection_born, execute_prepared, execute_query, get_db_cursor,
+    invalidate_query_cache, stream_query
+)
+
+# Mock-only tests, selectable with -m unit
+pytestmark = pytest.mark.unit
+
+# The real get_connection, before the autouse fixture patches it out
+_get_connection = Database.__dict__['get_connection']
+
+
+class TestExecutePrepared:
+    """Test suite for server-side prepared statement helper"""
+
+    def test_prepares_once_per_connection(self):
+        """Test statement is PREPAREd on first use and only EXECUTEd afterwards"""
+        cursor = MagicMock()
+        query = "SELECT * FROM inventory.users WHERE user_id = %s AND active = %s"
+
+        execute_prepared(cursor, 'test_stmt', query, (1, True))
+        execute_prepared(cursor, 'test_stmt', query, (2, True))
+
+        calls = cursor.execute.call_args_list
+        assert len(calls) == 3
+        assert calls[0][0][0] == (
+            "PREPARE test_stmt AS "
+            "SELECT * FROM inventory.users WHERE user_id = $1 AND active = $2"
+        )
+        assert calls[1][0] == ("EXECUTE test_stmt (%s, %s)", (1, True))
+        assert calls[2][0] == ("EXECUTE test_stmt (%s, %s)", (2, True))
+
+    def test_prepares_again_on_new_connection(self):
+        """Test each pooled connection gets its own PREPARE"""
+        first, second = MagicMock(), MagicMock()
+        query = "SELECT * FROM inventory.items WHERE item_id = %s"
+
+        execute_prepared(first, 'other_stmt', query, (1,))
+        execute_prepared(second, 'other_stmt', query, (1,))
+
+        assert 'PREPARE other_stmt' in first.execute.call_args_list[0][0][0]
+        assert 'PREPARE other_stmt' in second.execute.call_args_list[0][0][0]
+
+
+class TestQueryCache:
+    """Test suite for the short-lived query result cache"""
+
+    def test_cached_read_hits_database_once(self):
+        """Test identical cached reads within the TTL share one query"""
+        query = "SELECT * FROM inventory.v_active_checkouts WHERE user_id = ANY(%s::int[])"
+
+        with patch('database.get_db_cursor') as mock_get_cursor:
+            cursor = mock_get_cursor.return_value.__enter__.return_value
+            cursor.fetchall.return_value = [{'checkout_id': 1}]
+
+            first = execute_query(query, ([1, 2],), fetch_all=True, cached=True)
+            second = execute_query(query, ([1, 2],), fetch_all=True, cached=True)
+
+        assert first == second == [{'checkout_id': 1}]
+        cursor.execute.assert_called_once()
+
+    def test_cached_single_row_read_hits_database_once(self):
+        """Test identical cached fetch_one reads within the TTL share one query"""
+        query = "SELECT json_agg(c) AS checkouts FROM inventory.v_active_checkouts c"
+
+        with patch('database.get_db_cursor') as mock_get_cursor:
+            cursor = mock_get_cursor.return_value.__enter__.return_value
+            cursor.fetchone.return_value = {'checkouts': '[]'}
+
+            first = execute_query(query, fetch_one=True, cached=True)
+            second = execute_query(query, fetch_one=True, cached=True)
+
+        assert first == second == {'checkouts': '[]'}
+        cursor.execute.assert_called_once()
+        cursor.fetchall.assert_not_called()
+
+    def test_invalidate_forces_fresh_read(self):
+        """Test a write invalidates previously cached reads"""
+        query = "SELECT * FROM inventory.v_active_checkouts"
+
+        with patch('database.get_db_cursor') as mock_get_cursor:
+            cursor = mock_get_cursor.return_value.__enter__.return_value
+            cursor.fetchall.return_value = []
+
+            execute_query(query, fetch_all=True, cached=True)
+            invalidate_query_cache()
+            execute_query(query, fetch_all=True, cached=True)
+
+        assert cursor.execute.call_count == 2
+
+    def test_uncached_read_always_queries(self):
+        """Test reads without cached=True bypass the cache"""
+        query = "SELECT * FROM inventory.v_active_checkouts"
+
+        with patch('database.get_db_cursor') as mock_get_cursor:
+            cursor = mock_get_cursor.return_value.__enter__.return_value
+            cursor.fetchall.return_value = []
+
+            execute_query(query, fetch_all=True)
+            execute_query(query, fetch_all=True)
+
+        assert cursor.execute.call_count == 2
+
+
+class TestInitApp:
+    """Test suite for pool initialization from app config"""
+
+    def test_connection_options_passed_to_pool(self):
+        """Test timeouts, application name and keepalives reach the pool"""
+        # A fresh app: the shared one has already served requests
+        with patch.object(Database, 'initialize') as mock_initialize:
+            create_app('test')
+
+        kwargs = mock_initialize.call_args[1]
+        assert kwargs['application_name'] == 'inventory_api'
+        assert '-c statement_timeout=5000' in kwargs['options']
+        assert '-c idle_in_transaction_session_timeout=10000' in kwargs['options']
+        assert kwargs['keepalives'] == 1
+        assert kwargs['pre_ping'] is False
+        assert kwargs['pool_recycle'] == 1800
+
+
+class TestConnectionPool:
+    """Test suite for handing out only usable pooled connections"""
+
+    def test_discards_connection_failing_pre_ping(self):
+        """Test a connection failing SELECT 1 is closed and another taken"""
+        broken, healthy = MagicMock(closed=0), MagicMock(closed=0)
+        broken.cursor.return_value.__enter__.return_value.execute.side_effect = (
+            psycopg2.OperationalError('server closed the connection')
+        )
+        connection_pool = MagicMock(maxconn=5)
+        connection_pool.getconn.side_effect = [broken, healthy]
+
+        with patch.object(Database, 'get_connection', _get_connection), \
+                patch.object(Database, '_connection_pool', connection_pool), \
+                patch.object(Database, '_pre_ping', True):
+            assert Database.get_connection() is healthy
+
+        connection_pool.putconn.assert_called_once_with(broken, close=True)
+        healthy.rollback.assert_called_once()
+
+    def test_recycles_old_connections(self):
+        """Test connections older than pool_recycle are not handed out"""
+        connection = MagicMock(closed=0)
+        _connection_born[connection] = time.monotonic() - 3600
+
+        with patch.object(Database, '_pool_recycle', 1800):
+            assert Database._is_usable(connection) is False
+
+    def test_closed_connection_not_usable(self):
+        """Test a connection closed by the server is rejected without a ping"""
+        connection = MagicMock(closed=2)
+
+        with patch.object(Database, '_pre_ping', True):
+            assert Database._is_usable(connection) is False
+
+        connection.cursor.assert_not_called()
+
+
+class TestExecuteQuery:
+    """Test suite for execute_query return semantics"""
+
+    def test_no_fetch_returns_none(self):
+        """Test a read without fetch_one/fetch_all no longer fetches rows"""
+        with patch('database.get_db_cursor') as mock_get_cursor:
+            cursor = mock_get_cursor.return_value.__enter__.return_value
+
+            result = execute_query("SELECT 1")
+
+        assert result is None
+        cursor.fetchall.assert_not_called()
+
+    def test_commit_returns_rowcount(self):
+        """Test a committed write returns the affected row count"""
+        with patch('database.get_db_cursor') as mock_get_cursor:
+            cursor = mock_get_cursor.return_value.__enter__.return_value
+            cursor.rowcount = 3
+
+            result = execute_query("DELETE FROM inventory.checkout", commit=True)
+
+        assert result == 3
+
+
+class TestStreamQuery:
+    """Test suite for streaming large reads through a named cursor"""
+
+    def test_streams_rows_from_named_cursor(self):
+        """Test rows are yielded from a server-side cursor and the connection returned"""
+        connection = MagicMock()
+        cursor = connection.cursor.return_value
+        cursor.__iter__.return_value = iter([{'history_id': 1}, {'history_id': 2}])
+
+        with patch.object(Database, 'get_connection', return_value=connection), \
+                patch.object(Database, 'return_connection') as mock_return:
+            rows = list(stream_query("SELECT * FROM inventory.v_checkout_history", itersize=100))
+
+        assert rows == [{'history_id': 1}, {'history_id': 2}]
+        assert connection.cursor.call_args[1]['name'].startswith('stream_')
+        assert cursor.itersize == 100
+        mock_return.assert_called_once_with(connection)
+
+
+class TestRequestConnection:
+    """Test suite for sharing one connection per request"""
+
+    def test_cursors_share_request_connection(self, app):
+        """Test queries in one app context reuse a single pooled connection"""
+        with patch.object(Database, 'get_connection') as mock_get_connection:
+            with patch.object(Database, 'return_connection') as mock_return:
+                with app.app_context():
+                    with get_db_cursor() as cursor:
+                        cursor.execute("SELECT 1")
+                    with get_db_cursor(commit=True) as cursor:
+                        cursor.execute("SELECT 2")
+
+                    mock_return.assert_not_called()
+
+        mock_get_connection.assert_called_once()
+        mock_return.assert_called_once_with(mock_get_connection.return_value)
+
+    def test_nested_cursor_joins_outer_transaction(self, app):
+        """Test only the outermost block in a request commits or rolls back"""
+        with patch.object(Database, 'get_connection') as mock_get_connection:
+            with patch.object(Database, 'return_connection'):
+                with app.app_context():
+                    connection = mock_get_connection.return_value
+                    with get_db_cursor(commit=True):
+                        with get_db_cursor(commit=True):
+                            pass
+                        connection.commit.assert_not_called()
+                    connection.commit.assert_called_once()
+
+                    connection.reset_mock()
+                    with pytest.raises(ValueError):
+                        with get_db_cursor(commit=True):
+                            with get_db_cursor(commit=True):
+                                raise ValueError("boom")
+                    connection.rollback.assert_called_once()
+                    connection.commit.assert_not_called()
+
+    @pytest.mark.parametrize('exception, ended_with', [
+        (None, 'commit'),
+        (RuntimeError('boom'), 'rollback'),
+    ], ids=['success', 'error'])
+    def test_teardown_ends_request_transaction(self, app, exception, ended_with):
+        """Test app context teardown commits or rolls back before returning the connection"""
+        with patch.object(Database, 'get_connection') as mock_get_connection:
+            with patch.object(Database, 'return_connection') as mock_return:
+                ctx = app.app_context()
+                ctx.push()
+                with get_db_cursor():
+                    pass
+                ctx.pop(exception)
+
+        connection = mock_get_connection.return_value
+        getattr(connection, ended_with).assert_called_once()
+        mock_return.assert_called_once_with(connection)
+
+    def test_cursor_outside_request_returns_connection(self):
+        """Test cursors outside an app context check connections in and out"""
+        with patch.object(Database, 'get_connection') as mock_get_connection:
+            with patch.object(Database, 'return_connection') as mock_return:
+                with get_db_cursor() as cursor:
+                    cursor.execute("SELECT 1")
+
+        mock_return.assert_called_once_with(mock_get_connection.return_value)
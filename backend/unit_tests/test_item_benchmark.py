@@ -0,0 +1,32 @@
+"""
+Benchmarks for Item model hot paths
+
+Skipped unless pytest-benchmark is installed. Run them on their own with:
+
+    python -m pytest --benchmark-only unit_tests/test_item_benchmark.py
+"""
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from models.item import Item
+
+# Mock-only tests, selectable with -m unit
+pytestmark = pytest.mark.unit
+
+
+class TestItemBenchmark:
+    """Benchmarks for the Python wrapper around the guarded quantity UPDATE"""
+
+    @pytest.mark.benchmark(group='item', warmup=True, disable_gc=True)
+    def test_update_quantities(self, benchmark, mock_db_cursor):
+        """Benchmark a checkout quantity update against a mocked cursor"""
+        mock_db_cursor.fetchone.return_value = {
+            'item_id': 1, 'item_name': 'Test Drill', 'quantity_total': 10,
+            'quantity_available': 9, 'quantity_checked_out': 1
+        }
+
+        result = benchmark(Item.update_quantities, 1, 1, is_checkout=True)
+
+        assert result['quantity_available'] == 9
@@ -0,0 +1,55 @@
+"""
+Unit tests for the orjson JSON provider
+"""
+
+import pytest
+from datetime import date, datetime
+from decimal import Decimal
+
+from json_provider import OrjsonProvider
+
+# Mock-only tests, selectable with -m unit
+pytestmark = pytest.mark.unit
+
+
+class TestOrjsonProvider:
+    """Test suite for OrjsonProvider"""
+
+    def test_app_uses_orjson_provider(self, app):
+        """Test the app factory installs the provider"""
+        assert isinstance(app.json, OrjsonProvider)
+
+    def test_dumps_datetimes_as_iso(self, app):
+        """Test datetimes and dates are encoded as ISO 8601"""
+        data = {'when': datetime(2024, 10, 20, 18, 0, 0), 'day': date(2024, 10, 20)}
+
+        result = app.json.loads(app.json.dumps(data))
+
+        assert result == {'when': '2024-10-20T18:00:00', 'day': '2024-10-20'}
+
+    def test_dumps_falls_back_for_decimal(self, app):
+        """Test types orjson does not know go through Flask's encoder"""
+        assert app.json.loads(app.json.dumps({'price': Decimal('1.50')})) == {'price': '1.50'}
+
+    def test_jsonify_response(self, app):
+        """Test jsonify produces a JSON response through the provider"""
+        with app.test_request_context():
+            response = app.json.response({'success': True})
+
+        assert response.mimetype == 'application/json'
+        assert response.get_json() == {'success': True}
+
+    def test_dumps_sort_keys(self, app):
+        """Test keys are sorted by default and left in order when sort_keys is off"""
+        provider = OrjsonProvider(app)
+
+        assert provider.dumps({'b': 1, 'a': 2}) == '{"a":2,"b":1}'
+        provider.sort_keys = False
+        assert provider.dumps({'b': 1, 'a': 2}) == '{"b":1,"a":2}'
+
+    def test_client_parses_with_provider(self, app, client):
+        """Test client responses are parsed by the app's provider"""
+        response = client.get('/health')
+
+        assert response.json_module is app.json
+        assert response.get_json()['status'] == 'healthy'
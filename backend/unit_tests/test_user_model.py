@@ -2,85 +2,152 @@
 Unit tests for User model
 """
 
+import re
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import Mock
 from models.user import User
 
+# Mock-only tests, selectable with -m unit
+pytestmark = pytest.mark.unit
+
+# SQL clauses matched regardless of spacing, compiled once
+_ACTIVE_ONLY = re.compile(r'WHERE\s+active\s*=\s*TRUE')
+_ORDER_BY_NAME = re.compile(r'ORDER\s+BY\s+full_name')
+_UPDATED_AT = re.compile(r'updated_at\s*=\s*CURRENT_TIMESTAMP')
+
 
 class TestUserModel:
     """Test suite for User model"""
 
-    def test_get_by_ldap_success(self, mock_execute_query, sample_user):
-        """Test successful user retrieval by LDAP"""
+    @pytest.mark.parametrize('method, arg, fragments, expected_params', [
+        (User.get_by_ldap, 'jdoe', ('ldap = %s', 'active = TRUE'), ('jdoe',)),
+        (User.get_by_id, 1, ('user_id = %s',), (1,)),
+    ], ids=['by_ldap', 'by_id'])
+    def test_get_user_success(self, mock_execute_query, sample_user, method, arg, fragments,
+                              expected_params):
+        """Test successful user retrieval by LDAP and by ID"""
         mock_execute_query.return_value = sample_user
 
-        result = User.get_by_ldap('jdoe')
+        result = method(arg)
 
         assert result == sample_user
-        mock_execute_query.assert_called_once()
-        # Check that the query includes LDAP and active filters
-        call_args = mock_execute_query.call_args
-        assert 'ldap = %s' in call_args[0][0]
-        assert 'active = TRUE' in call_args[0][0]
-        assert call_args[0][1] == ('jdoe',)
-
-    def test_get_by_ldap_not_found(self, mock_execute_query):
-        """Test user not found by LDAP"""
+        # Check that the query filters on the lookup key
+        query, params = mock_execute_query.call_args[0]
+        assert all(fragment in query for fragment in fragments)
+        assert params == expected_params
+
+    @pytest.mark.parametrize('method, arg', [
+        (User.get_by_ldap, 'nonexistent'),
+        (User.get_by_id, 999),
+    ], ids=['by_ldap', 'by_id'])
+    def test_get_user_not_found(self, mock_execute_query, method, arg):
+        """Test user not found by LDAP or by ID"""
         mock_execute_query.return_value = None
 
-        result = User.get_by_ldap('nonexistent')
+        result = method(arg)
 
         assert result is None
 
-    def test_get_by_id_success(self, mock_execute_query, sample_user):
-        """Test successful user retrieval by ID"""
+    def test_get_by_ldaps(self, mock_execute_query, sample_user):
+        """Test resolving several LDAPs in one query"""
+        mock_execute_query.return_value = [sample_user]
+
+        result = User.get_by_ldaps(['jdoe', 'missing'])
+
+        assert result == {'jdoe': sample_user}
+        mock_execute_query.assert_called_once()
+        query, params = mock_execute_query.call_args[0]
+        assert 'ldap = ANY(%s)' in query
+        assert params == (['jdoe', 'missing'],)
+
+    def test_get_by_id_cached(self, mock_execute_query, sample_user):
+        """Test repeated lookups by ID hit the cache"""
         mock_execute_query.return_value = sample_user
 
-        result = User.get_by_id(1)
+        assert User.get_by_id(1) == sample_user
+        assert User.get_by_id(1) == sample_user
 
-        assert result == sample_user
         mock_execute_query.assert_called_once()
-        call_args = mock_execute_query.call_args
-        assert 'user_id = %s' in call_args[0][0]
-        assert call_args[0][1] == (1,)
 
-    def test_get_by_id_not_found(self, mock_execute_query):
-        """Test user not found by ID"""
-        mock_execute_query.return_value = None
+    def test_get_by_ldap_miss_not_cached(self, mock_execute_query, sample_user):
+        """Test a missing user is looked up again on the next call"""
+        # The first lookup misses, the retry finds the user
+        mock_execute_query.side_effect = [None, sample_user]
 
-        result = User.get_by_id(999)
+        assert User.get_by_ldap('jdoe') is None
+        assert User.get_by_ldap('jdoe') == sample_user
+        assert mock_execute_query.call_count == 2
 
-        assert result is None
+    def test_update_invalidates_cache(self, mock_execute_query, mock_db_cursor, sample_user):
+        """Test updating a user drops its cached lookups"""
+        mock_execute_query.return_value = sample_user
+        User.get_by_id(1)
+        User.get_by_ldap('jdoe')
 
-    def test_create_user_minimal(self, mock_db_cursor, sample_user):
-        """Test creating user with minimal required fields"""
         mock_db_cursor.fetchone.return_value = sample_user
+        User.update(1, email='newemail@company.com')
 
-        result = User.create('jdoe', 'John Doe')
+        User.get_by_id(1)
+        User.get_by_ldap('jdoe')
+        assert mock_execute_query.call_count == 4
 
-        assert result == sample_user
-        mock_db_cursor.execute.assert_called_once()
-        # Verify INSERT query
-        call_args = mock_db_cursor.execute.call_args
-        assert 'INSERT INTO users' in call_args[0][0]
-        assert call_args[0][1][0] == 'jdoe'
-        assert call_args[0][1][1] == 'John Doe'
-
-    def test_create_user_all_fields(self, mock_db_cursor, sample_user):
-        """Test creating user with all fields"""
+    def test_get_by_ldap_request_cache(self, app, mock_execute_query, sample_user):
+        """Test repeat lookups within a request are served from flask.g"""
+        from flask import g
+        from models.user import _user_cache
+        mock_execute_query.return_value = sample_user
+
+        with app.test_request_context():
+            assert User.get_by_ldap('jdoe') == sample_user
+            _user_cache.clear()
+            assert User.get_by_ldap('jdoe') == sample_user
+            assert g.user_lookups[('ldap', 'jdoe')] == sample_user
+
+        mock_execute_query.assert_called_once()
+
+    def test_update_invalidates_request_cache(self, app, mock_execute_query,
+                                              mock_db_cursor, sample_user):
+        """Test updating a user drops its per-request lookups"""
+        from flask import g
+        mock_execute_query.return_value = sample_user
+        mock_db_cursor.fetchone.return_value = sample_user
+
+        with app.test_request_context():
+            User.get_by_ldap('jdoe')
+            User.update(1, email='newemail@company.com')
+            assert ('ldap', 'jdoe') not in g.user_lookups
+
+    @pytest.mark.parametrize('method, args, kwargs', [
+        (User.create, ('jdoe', 'John Doe'), {}),
+        (User.update, (1,), {'full_name': 'Johnny Doe'}),
+    ], ids=['create', 'update'])
+    def test_write_invalidates_query_cache(self, mock_db_cursor, sample_user, monkeypatch,
+                                           method, args, kwargs):
+        """Test user writes drop cached checkout reads, which join in user columns"""
+        mock_invalidate = Mock()
+        monkeypatch.setattr('models.user.invalidate_query_cache', mock_invalidate)
         mock_db_cursor.fetchone.return_value = sample_user
 
-        result = User.create(
-            'jdoe',
-            'John Doe',
-            email='jdoe@company.com',
-            role='manager',
-            department='Operations'
-        )
+        method(*args, **kwargs)
+
+        mock_invalidate.assert_called_once()
+
+    @pytest.mark.parametrize('kwargs, expected_params, fragments', [
+        # email and department default to NULL, role to employee
+        ({}, ('jdoe', 'John Doe', None, 'employee', None), ('INSERT INTO inventory.users',)),
+        ({'email': 'jdoe@company.com', 'role': 'manager', 'department': 'Operations'},
+         ('jdoe', 'John Doe', 'jdoe@company.com', 'manager', 'Operations'), ()),
+    ], ids=['minimal', 'all_fields'])
+    def test_create_user(self, mock_db_cursor, sample_user, kwargs, expected_params, fragments):
+        """Test creating users with required and optional fields"""
+        mock_db_cursor.fetchone.return_value = sample_user
+
+        result = User.create('jdoe', 'John Doe', **kwargs)
 
         assert result == sample_user
-        call_args = mock_db_cursor.execute.call_args
-        assert call_args[0][1] == ('jdoe', 'John Doe', 'jdoe@company.com', 'manager', 'Operations')
+        query, params = mock_db_cursor.execute.call_args[0]
+        assert all(fragment in query for fragment in fragments)
+        assert params == expected_params
 
     def test_get_all_active_only(self, mock_execute_query, sample_user):
         """Test getting all active users"""
@@ -89,78 +156,59 @@ class TestUserModel:
         result = User.get_all(active_only=True)
 
         assert result == [sample_user]
-        call_args = mock_execute_query.call_args
-        assert 'WHERE active = TRUE' in call_args[0][0]
-        assert 'ORDER BY full_name' in call_args[0][0]
+        query = mock_execute_query.call_args[0][0]
+        assert _ACTIVE_ONLY.search(query)
+        assert _ORDER_BY_NAME.search(query)
 
     def test_get_all_including_inactive(self, mock_execute_query, sample_user):
         """Test getting all users including inactive"""
-        inactive_user = sample_user.copy()
-        inactive_user['active'] = False
+        inactive_user = {**sample_user, 'active': False}
         mock_execute_query.return_value = [sample_user, inactive_user]
 
         result = User.get_all(active_only=False)
 
         assert len(result) == 2
-        call_args = mock_execute_query.call_args
-        assert 'WHERE active = TRUE' not in call_args[0][0]
-
-    def test_update_user_single_field(self, mock_db_cursor, sample_user):
-        """Test updating a single user field"""
-        updated_user = sample_user.copy()
-        updated_user['email'] = 'newemail@company.com'
-        mock_db_cursor.fetchone.return_value = updated_user
-
-        result = User.update(1, email='newemail@company.com')
-
-        assert result == updated_user
-        call_args = mock_db_cursor.execute.call_args
-        assert 'UPDATE users' in call_args[0][0]
-        assert 'email = %s' in call_args[0][0]
-        assert 'updated_at = CURRENT_TIMESTAMP' in call_args[0][0]
-
-    def test_update_user_multiple_fields(self, mock_db_cursor, sample_user):
-        """Test updating multiple user fields"""
-        updated_user = sample_user.copy()
-        updated_user['email'] = 'newemail@company.com'
-        updated_user['role'] = 'manager'
+        query = mock_execute_query.call_args[0][0]
+        assert not _ACTIVE_ONLY.search(query)
+
+    @pytest.mark.parametrize('kwargs, fragments', [
+        ({'email': 'newemail@company.com'},
+         ('UPDATE inventory.users', 'email = %s')),
+        ({'email': 'newemail@company.com', 'role': 'manager'}, ('email = %s', 'role = %s')),
+    ], ids=['single_field', 'multiple_fields'])
+    def test_update_user(self, mock_db_cursor, sample_user, kwargs, fragments):
+        """Test updating one or several user fields"""
+        updated_user = {**sample_user, **kwargs}
         mock_db_cursor.fetchone.return_value = updated_user
 
-        result = User.update(1, email='newemail@company.com', role='manager')
+        result = User.update(1, **kwargs)
 
         assert result == updated_user
-        call_args = mock_db_cursor.execute.call_args
-        assert 'email = %s' in call_args[0][0]
-        assert 'role = %s' in call_args[0][0]
+        query = mock_db_cursor.execute.call_args[0][0]
+        assert all(fragment in query for fragment in fragments)
+        assert _UPDATED_AT.search(query)
 
-    def test_update_user_invalid_fields(self, mock_db_cursor):
-        """Test updating with invalid fields returns None"""
-        result = User.update(1, invalid_field='value')
-
-        assert result is None
-        mock_db_cursor.execute.assert_not_called()
-
-    def test_update_user_no_fields(self, mock_db_cursor):
-        """Test updating with no fields returns None"""
-        result = User.update(1)
+    @pytest.mark.parametrize('kwargs', [{'invalid_field': 'value'}, {}],
+                             ids=['invalid_fields', 'no_fields'])
+    def test_update_user_rejected(self, mock_db_cursor, kwargs):
+        """Test updating with no allowed fields returns None without a query"""
+        result = User.update(1, **kwargs)
 
         assert result is None
         mock_db_cursor.execute.assert_not_called()
 
     def test_deactivate_user(self, mock_db_cursor, sample_user):
         """Test deactivating a user"""
-        deactivated_user = sample_user.copy()
-        deactivated_user['active'] = False
+        deactivated_user = {**sample_user, 'active': False}
         mock_db_cursor.fetchone.return_value = deactivated_user
 
         result = User.deactivate(1)
 
         assert result is True
-        mock_db_cursor.execute.assert_called_once()
-        call_args = mock_db_cursor.execute.call_args
-        assert 'UPDATE users' in call_args[0][0]
+        query, params = mock_db_cursor.execute.call_args[0]
+        assert 'UPDATE inventory.users' in query
         # Check that active = False is in the values
-        assert False in call_args[0][1]
+        assert False in params
 
     def test_deactivate_user_not_found(self, mock_db_cursor):
         """Test deactivating non-existent user"""
@@ -170,16 +218,11 @@ class TestUserModel:
 
         assert result is False
 
-    def test_allowed_update_fields(self, mock_db_cursor, sample_user):
-        """Test that only allowed fields can be updated"""
-        allowed_fields = ['full_name', 'email', 'role', 'department', 'active']
-
-        for field in allowed_fields:
-            mock_db_cursor.reset_mock()
-            mock_db_cursor.fetchone.return_value = sample_user
+    @pytest.mark.parametrize('field', ['full_name', 'email', 'role', 'department', 'active'])
+    def test_allowed_update_fields(self, mock_db_cursor, sample_user, field):
+        """Test that each allowed field can be updated"""
+        mock_db_cursor.fetchone.return_value = sample_user
 
-            User.update(1, **{field: 'test_value'})
+        User.update(1, **{field: 'test_value'})
 
-            assert mock_db_cursor.execute.called
-            call_args = mock_db_cursor.execute.call_args
-            assert f"{field} = %s" in call_args[0][0]
\ No newline at end of file
+        assert f"{field} = %s" in mock_db_cursor.execute.call_args[0][0]
\ No newline at end of file